@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+
+import itertools
+import re
+import time
+
+import SafeChain.Variable as MyVariable
+
+COMPARISONS = ('=', '!=', '>', '>=', '<', '<=')
+
+class AbstractionRefinement:
+    """
+    Counterexample-guided refinement of range grouping. Range variables are
+    first partitioned by the constants of the policy only. A rule condition
+    that a group does not decide is replaced by a free input (IVAR) for that
+    group, so the abstract model over-approximates the home and SUCCESS is
+    final. A counterexample that passes an undecided group is spurious
+    evidence; the constants of those conditions are added and the check is
+    repeated.
+    """
+    def __init__(self, controller):
+        self.controller = controller
+
+    def getTruth(self, segments, operator, value):
+        # True or False when every value of the segments agrees, None otherwise
+        truths = set()
+        for start, end in segments:
+            if operator in ('=', '!='):
+                if start == end == value:
+                    truth = True
+                elif value < start or value > end:
+                    truth = False
+                else:
+                    truth = None
+                if operator == '!=' and truth is not None:
+                    truth = not truth
+            elif operator == '>':
+                truth = True if start > value else (False if end <= value else None)
+            elif operator == '>=':
+                truth = True if start >= value else (False if end < value else None)
+            elif operator == '<':
+                truth = True if end < value else (False if start >= value else None)
+            else:
+                truth = True if end <= value else (False if start > value else None)
+            truths.add(truth)
+
+        if len(truths) == 1:
+            return truths.pop()
+        return None
+
+    def getAtoms(self, policy):
+        """
+        Return ({condition: (channel, variable, operator, value)} for the
+        comparisons that may be abstracted, variables that must keep the full
+        partition).
+        """
+        controller = self.controller
+        atoms = dict()
+        fixed = set()
+
+        conditions = [condition for rule in controller.rules for condition in rule.getConditions()]
+        conditions += list(policy.getConditions())
+        conditions += list(controller.getInitialConditions())
+
+        for condition in conditions:
+            for channel_name, variable_name, operator, value in condition.getConstraints():
+                channel = controller.getChannel(channel_name)
+                variable = channel.getVariable(variable_name)
+                if not isinstance(variable, MyVariable.RangeVariable):
+                    continue
+
+                if operator == '≡':
+                    fixed.add((channel_name, variable_name))
+                    fixed.add(tuple(value.split('.')))
+                elif operator in COMPARISONS and len(condition.original) == 3 and isinstance(value, str) and re.fullmatch(r'-?\d+', value):
+                    atoms[condition] = (channel_name, variable_name, operator, int(value))
+                elif operator != '←':
+                    # computations, sets and ranges
+                    fixed.add((channel_name, variable_name))
+
+        return atoms, fixed
+
+    def abstract(self, policy, atoms, fixed, precise):
+        """
+        Group with the precise conditions only and rewrite the others.
+        Return {input: (channel, variable, operator, value)} for the inputs
+        that stand for undecided conditions.
+        """
+        controller = self.controller
+        controller.grouping(policy)
+
+        constraints = dict()
+        for condition in precise:
+            channel_name, variable_name, operator, value = atoms[condition]
+            constraints.setdefault((channel_name, variable_name), set()).add((operator, value))
+
+        abstracted = set(atom[:2] for atom in atoms.values()) - fixed
+        for channel_name, variable_name in abstracted:
+            variable = controller.getChannel(channel_name).getVariable(variable_name)
+            variable.constraints = set()
+            for operator, value in constraints.get((channel_name, variable_name), ()):
+                variable.addConstraint(operator, value)
+            variable.setGrouping(True)
+
+        # assignments and decided conditions follow the new partition
+        conditions = itertools.chain((condition for rule in controller.rules for condition in rule.getConditions()),
+                                     policy.getConditions(), controller.getInitialConditions())
+        for condition in conditions:
+            condition.toEquivalentCondition(controller)
+
+        inputs = dict()
+        controller.inputs = dict()
+        for condition, (channel_name, variable_name, operator, value) in atoms.items():
+            if (channel_name, variable_name) not in abstracted:
+                continue
+
+            variable = controller.getChannel(channel_name).getVariable(variable_name)
+            decided = list()
+            undecided = list()
+            for group in sorted(variable.getPossibleGroups()):
+                truth = self.getTruth(variable.getSegments(group), operator, value)
+                if truth is None:
+                    undecided.append(group)
+                elif truth:
+                    decided.append(group)
+
+            subject = condition.original[0]
+            if len(undecided) == 0:
+                if len(decided) == 0:
+                    condition.setTuple(('FALSE', ))
+                else:
+                    condition.setTuple((subject, 'in', '{{{0}}}'.format(', '.join(decided))))
+                continue
+
+            input_name = 'cegar_{}'.format(len(inputs))
+            controller.inputs.setdefault(channel_name, list()).append(input_name)
+            inputs['{0}.{1}'.format(channel_name, input_name)] = (channel_name, variable_name, operator, value)
+
+            tokens = ['(']
+            if len(decided) != 0:
+                tokens += [subject, 'in', '{{{0}}}'.format(', '.join(decided)), '|']
+            tokens += ['(', subject, 'in', '{{{0}}}'.format(', '.join(undecided)), '&', '{0}.{1}'.format(channel_name, input_name), '=', 'TRUE', ')', ')']
+            condition.setTuple(tuple(tokens))
+
+        controller.invalidate()
+        return inputs
+
+    def getTraces(self, result):
+        for key in ('states', 'states_A', 'states_B'):
+            if key in result:
+                yield result[key]
+
+    def getDecidingInputs(self, boolean, state, next_state, inputs):
+        # the inputs read by boolean whose value alone flips its truth in this step
+        evaluator = self.controller.evaluator
+        truth = evaluator.evaluate(boolean, state, next_state)
+        deciding = list()
+        for input_name in evaluator.variable_pattern.findall(boolean):
+            if input_name not in inputs or input_name not in state:
+                continue
+
+            flipped = dict(state)
+            flipped[input_name] = 'FALSE' if state[input_name] == 'TRUE' else 'TRUE'
+            if evaluator.evaluate(boolean, flipped, next_state) != truth:
+                deciding.append(input_name)
+        return deciding
+
+    def replay(self, result, inputs, atoms):
+        """
+        Replay every transition of the counterexample and return the
+        abstracted conditions whose input decided a case the transition went
+        through (the case taken or one skipped before it), when a concrete
+        value of the group would have decided otherwise.
+        """
+        controller = self.controller
+        transitions = controller.getTransitions()
+
+        # every input stands for one rewritten condition
+        conditions = dict()
+        for condition in atoms:
+            for token in condition.tupple:
+                if token in inputs:
+                    conditions[token] = condition
+
+        offending = set()
+        for trace in self.getTraces(result):
+            for state, delta in trace.getSteps():
+                next_state = dict(state)
+                next_state.update(delta)
+
+                for channel_variable, rules in transitions.items():
+                    for boolean, value, rule_name in rules:
+                        for input_name in self.getDecidingInputs(boolean, state, next_state, conditions):
+                            channel_name, variable_name, operator, constant = inputs[input_name]
+                            group = state.get('{0}.{1}'.format(channel_name, variable_name))
+                            if group is None:
+                                continue
+
+                            variable = controller.getChannel(channel_name).getVariable(variable_name)
+                            chosen = state[input_name] == 'TRUE'
+                            if self.getTruth(variable.getSegments(group), operator, constant) != chosen:
+                                offending.add(conditions[input_name])
+
+                        if controller.evaluator.evaluate(boolean, state, next_state):
+                            # the case taken, later ones are not read
+                            break
+
+        return offending
+
+    def check(self, policy, custom=True, pruning=False, timeout=1800, bmc=False, max_iterations=None):
+        controller = self.controller
+        # grouping and pruning are redone on every iteration
+        stats = controller.prepareCheck(policy, custom, None, None)
+        atoms, fixed = self.getAtoms(policy)
+        policy_conditions = set(policy.getConditions()) | set(controller.getInitialConditions())
+        precise = set(condition for condition in atoms if condition in policy_conditions)
+
+        start = time.perf_counter()
+        checking_time = 0
+        try:
+            for iteration in itertools.count(1):
+                with stats.timer('grouping'):
+                    inputs = self.abstract(policy, atoms, fixed, precise)
+                stats.setCounter('undecided_conditions', len(inputs))
+
+                if pruning:
+                    with stats.timer('pruning'):
+                        controller.pruning(policy)
+                else:
+                    controller.unpruning(policy)
+
+                stats.groups.clear()
+                controller.recordGroups(stats)
+
+                remaining = timeout - (time.perf_counter() - start)
+                if remaining <= 0:
+                    filename, result = None, None
+                    break
+
+                with stats.timer('policy'):
+                    filename, result, iteration_time = policy.check(controller, remaining, bmc, True)
+                checking_time += iteration_time
+
+                if result is None or result['result'] != 'FAILED' or len(inputs) == 0:
+                    break
+
+                offending = self.replay(result, inputs, atoms)
+                if len(offending) == 0:
+                    # the counterexample never relied on an undecided condition
+                    break
+
+                if max_iterations is not None and iteration >= max_iterations:
+                    result = {'result': 'UNKNOWN'}
+                    break
+
+                precise |= offending
+                stats.increment('refinements')
+        finally:
+            controller.inputs = dict()
+            controller.invalidate()
+
+        if result is not None:
+            result['refinements'] = stats.getCounter('refinements')
+
+        return controller.finishCheck(policy, filename, result, checking_time)
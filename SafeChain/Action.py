@@ -4,7 +4,7 @@ import SafeChain.Boolean as MyBoolean
 import SafeChain.Assignment as MyAssignment
 
 class Action:
-    def __init__(self, rule_name, channel_name, definition, name, parameters):
+    def __init__(self, rule_name, channel_name, definition, name, parameters, compiler=None):
         self.rule_name = rule_name
         self.channel_name = channel_name
         self.definition = definition
@@ -15,14 +15,20 @@ class Action:
         for situation in self.definition['definition']:
             if 'boolean' in situation:
                 boolean_definition = situation['boolean']
-                boolean_string = boolean_definition.format(*parameters)
-                boolean = MyBoolean.Boolean(boolean_string)
+                if compiler is not None:
+                    boolean = compiler.getBoolean(boolean_definition, parameters)
+                else:
+                    boolean_string = boolean_definition.format(*parameters)
+                    boolean = MyBoolean.Boolean(boolean_string)
             else:
                 boolean = None
 
             assignment_definition = situation['assignment']
-            assignment_string = assignment_definition.format(*parameters)
-            assignment = MyAssignment.Assignment(assignment_string)
+            if compiler is not None:
+                assignment = compiler.getAssignment(assignment_definition, parameters)
+            else:
+                assignment_string = assignment_definition.format(*parameters)
+                assignment = MyAssignment.Assignment(assignment_string)
 
             self.situations.append((boolean, assignment))
 
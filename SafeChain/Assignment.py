@@ -3,9 +3,13 @@
 import SafeChain.Condition as MyCondition
 
 class Assignment:
-    def __init__(self, string):
+    __slots__ = ('string', 'conditions')
+
+    def __init__(self, string, conditions=None):
         self.string = string
-        self.conditions = self.parser(self.string)
+        if conditions is None:
+            conditions = self.parser(self.string)
+        self.conditions = conditions
 
     def parser(self, string):
         condition_strings = string.split(',')
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import concurrent.futures
+import itertools
+import os
+
+import SafeChain.Controller as MyController
+import SafeChain.Channel as MyChannel
+
+# channel database of the current worker process, set by initializeWorker
+database = None
+
+def initializeWorker(worker_database):
+    global database
+    database = worker_database
+
+def buildController(database, scenario):
+    """
+    scenario = {
+        'name': 'home-1',
+        'channels': [(channel_type, channel_name, state), ...],
+        'rules': [(rule_name, trigger_channel, trigger, trigger_inputs, action_channel, action, action_inputs), ...],
+        'vulnerables': [(channel_name, variable_name or None), ...],
+        'policy': PrivacyPolicy or InvariantPolicy,
+        'options': {'grouping': ..., 'pruning': ..., 'bmc': ..., 'timeout': ...},
+    }
+    """
+    controller = MyController.Controller(database)
+
+    for channel_type, channel_name, state in scenario['channels']:
+        channel = MyChannel.Channel(channel_type, database[channel_type], channel_name)
+        channel.setState(state)
+        controller.addChannel(channel)
+
+    for rule in scenario['rules']:
+        controller.addRule(*rule)
+
+    for channel_name, variable_name in scenario.get('vulnerables', ()):
+        if variable_name is None:
+            controller.addVulnerableChannel(channel_name)
+        else:
+            controller.addVulnerableChannelVariable(channel_name, variable_name)
+
+    return controller
+
+def verifyScenario(scenario, options):
+    controller = buildController(database, scenario)
+
+    options = dict(options, **scenario.get('options', {}))
+    return controller.check(scenario['policy'], **options)
+
+class BatchVerifier:
+    def __init__(self, database, processes=None, max_pending=None):
+        self.database = database
+        self.processes = processes if processes is not None else (os.cpu_count() or 1)
+        self.max_pending = max_pending if max_pending is not None else self.processes * 4
+
+    def run(self, scenarios, custom=True, grouping=False, pruning=False, timeout=1800, bmc=False):
+        """
+        Yield (scenario name, result of Controller.check or the raised exception)
+        in completion order. Scenarios are consumed lazily, so the iterable may be
+        a generator over far more combinations than fit in memory.
+        """
+        options = {'custom': custom, 'grouping': grouping, 'pruning': pruning, 'timeout': timeout, 'bmc': bmc}
+        scenarios = iter(scenarios)
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.processes,
+                                                    initializer=initializeWorker,
+                                                    initargs=(self.database,)) as executor:
+            pending = dict()
+            for scenario in itertools.islice(scenarios, self.max_pending):
+                pending[executor.submit(verifyScenario, scenario, options)] = scenario.get('name')
+
+            while len(pending) != 0:
+                done, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as exception:
+                        result = exception
+                    yield name, result
+
+                for scenario in itertools.islice(scenarios, len(done)):
+                    pending[executor.submit(verifyScenario, scenario, options)] = scenario.get('name')
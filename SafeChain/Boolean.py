@@ -2,10 +2,18 @@
 
 import SafeChain.Condition as MyCondition
 
+OPERATORS = frozenset(('(', ')', '&', '|', '!'))
+
 class Boolean:
-    def __init__(self, string):
+    __slots__ = ('string', 'infix_tokens', 'rendered', 'generation')
+
+    def __init__(self, string, infix_tokens=None):
         self.string = string
-        self.infix_tokens = self.parser(self.string)
+        if infix_tokens is None:
+            infix_tokens = self.parser(self.string)
+        self.infix_tokens = infix_tokens
+        self.rendered = None
+        self.generation = None
 
     def tokenize(self, string):
         return string.split(' ')
@@ -17,7 +25,7 @@ class Boolean:
         i = 0
         while i < len(tokens):
             token = tokens[i]
-            if token in ('(', ')', '&', '|', '!'):
+            if token in OPERATORS:
                 infix_tokens.append(token)
                 i += 1
                 continue
@@ -25,7 +33,7 @@ class Boolean:
             bool_condition = [token]
             i += 1
 
-            while i < len(tokens) and tokens[i] not in ('(', ')', '&', '|', '!'):
+            while i < len(tokens) and tokens[i] not in OPERATORS:
                 bool_condition.append(tokens[i])
                 bool_condition.append(tokens[i+1])
                 i += 2
@@ -38,21 +46,28 @@ class Boolean:
 
     def getConditions(self):
         for token in self.infix_tokens:
-            if token in ('(', ')', '&', '|', '!'):
+            if isinstance(token, str):
                 continue
 
             yield token
 
     def getString(self):
+        # conditions change under grouping, any change moves Condition.generation
+        if self.generation == MyCondition.Condition.generation:
+            return self.rendered
+        generation = MyCondition.Condition.generation
+
         tokens = []
         for token in self.infix_tokens:
-            if token in ('(', ')', '&', '|', '!'):
+            if isinstance(token, str):
                 tokens.append(token)
                 continue
 
             string = token.getString()
             tokens.append(string)
 
-        return ' '.join(tokens)
+        self.rendered = ' '.join(tokens)
+        self.generation = generation
+        return self.rendered
 
 
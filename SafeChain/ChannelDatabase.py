@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+import collections.abc
+import glob
+import json
+import mmap
+import os
+import pickle
+import string
+import struct
+import sys
+
+import SafeChain.TemplateCompiler as MyTemplateCompiler
+
+MAGIC = b'SAFECHAINDB2\n'
+HEADER = struct.Struct('<Q')
+
+def validateVariable(channel_type, variable_name, definition):
+    variable_type = definition.get('type')
+    if variable_type == 'boolean':
+        domain = set(['TRUE', 'FALSE'])
+    elif variable_type == 'set':
+        if len(definition.get('setValue', ())) == 0:
+            raise ValueError('{0}.{1}: empty setValue'.format(channel_type, variable_name))
+        domain = set(definition['setValue'])
+    elif variable_type == 'range':
+        minValue, maxValue = definition.get('minValue'), definition.get('maxValue')
+        if not isinstance(minValue, int) or not isinstance(maxValue, int) or minValue > maxValue:
+            raise ValueError('{0}.{1}: invalid range'.format(channel_type, variable_name))
+        if not isinstance(definition.get('window', 0), int):
+            raise ValueError('{0}.{1}: invalid window'.format(channel_type, variable_name))
+        domain = range(minValue, maxValue + 1)
+    else:
+        raise TypeError('{0}.{1}: unknown variable type {2!r}'.format(channel_type, variable_name, variable_type))
+
+    if 'resetValue' in definition and definition['resetValue'] not in domain:
+        raise ValueError('{0}.{1}: resetValue outside domain'.format(channel_type, variable_name))
+
+def getTemplateFields(template):
+    fields = set()
+    for literal, field, format_spec, conversion in string.Formatter().parse(template):
+        if field is not None:
+            fields.add(int(field))
+    return fields
+
+def validateTemplate(channel_type, name, definition):
+    number_of_inputs = len(definition['input'])
+
+    if isinstance(definition['definition'], dict):
+        templates = [definition['definition']['boolean']]
+    else:
+        templates = list()
+        for situation in definition['definition']:
+            templates.append(situation['assignment'])
+            if 'boolean' in situation:
+                templates.append(situation['boolean'])
+
+    for template in templates:
+        for field in getTemplateFields(template):
+            if field >= number_of_inputs:
+                raise ValueError('{0}/{1}: placeholder {{{2}}} without input'.format(channel_type, name, field))
+
+def validateChannel(channel_type, definition):
+    for variable_name, variable_definition in definition['variables'].items():
+        validateVariable(channel_type, variable_name, variable_definition)
+
+    for name, trigger in definition.get('triggers', {}).items():
+        validateTemplate(channel_type, name, trigger)
+
+    for name, action in definition.get('actions', {}).items():
+        validateTemplate(channel_type, name, action)
+
+def compileDatabase(channel_directory, filename):
+    compiler = MyTemplateCompiler.TemplateCompiler()
+    payloads = dict()
+    for path in sorted(glob.glob(os.path.join(channel_directory, '*.json'))):
+        channel_type = os.path.splitext(os.path.basename(path))[0]
+        with open(path) as f:
+            definition = json.load(f)
+
+        validateChannel(channel_type, definition)
+        # the definition together with its parsed trigger/action templates
+        boolean_templates, assignment_templates = compiler.compileTemplates(definition)
+        payloads[channel_type] = pickle.dumps((definition, boolean_templates, assignment_templates), protocol=pickle.HIGHEST_PROTOCOL)
+
+    index = dict()
+    offset = 0
+    for channel_type, payload in payloads.items():
+        index[channel_type] = (offset, len(payload))
+        offset += len(payload)
+    index = json.dumps(index, sort_keys=True).encode('UTF-8')
+
+    # write then rename so that running workers keep their old mapping
+    temporary = '{}.tmp'.format(filename)
+    with open(temporary, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER.pack(len(index)))
+        f.write(index)
+        for payload in payloads.values():
+            f.write(payload)
+    os.replace(temporary, filename)
+
+    return ChannelDatabase(filename)
+
+class ChannelDatabase(collections.abc.Mapping):
+    def __init__(self, filename):
+        self.filename = filename
+        self.buffer = None
+        self.index = None
+        self.base = 0
+        self.definitions = dict()
+        self.templates = dict()
+
+    def open(self):
+        with open(self.filename, 'rb') as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self.buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError('{} is not a compiled channel database'.format(self.filename))
+
+        start = len(MAGIC) + HEADER.size
+        length, = HEADER.unpack(self.buffer[len(MAGIC):start])
+        self.index = json.loads(self.buffer[start:start + length].decode('UTF-8'))
+        self.base = start + length
+
+    def getIndex(self):
+        if self.index is None:
+            self.open()
+        return self.index
+
+    def __getitem__(self, channel_type):
+        if channel_type in self.definitions:
+            return self.definitions[channel_type]
+
+        offset, length = self.getIndex()[channel_type]
+        start = self.base + offset
+        definition, boolean_templates, assignment_templates = pickle.loads(self.buffer[start:start + length])
+        self.definitions[channel_type] = definition
+        self.templates[channel_type] = (boolean_templates, assignment_templates)
+        return definition
+
+    def getTemplates(self, channel_type):
+        # (boolean templates, assignment templates) for TemplateCompiler.addTemplates
+        if channel_type not in self.templates:
+            self[channel_type]
+        return self.templates[channel_type]
+
+    def __iter__(self):
+        return iter(self.getIndex())
+
+    def __len__(self):
+        return len(self.getIndex())
+
+    def __contains__(self, channel_type):
+        return channel_type in self.getIndex()
+
+    def __getstate__(self):
+        # only the path crosses process boundaries, every process maps the file itself
+        return {'filename': self.filename}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'])
+
+    def close(self):
+        if self.buffer is not None:
+            self.buffer.close()
+        self.buffer = None
+        self.index = None
+        self.definitions.clear()
+        self.templates.clear()
+
+def isCurrent(filename):
+    # written by this version of compileDatabase
+    with open(filename, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+def loadDatabase(filename, channel_directory=None):
+    """
+    Open a compiled database, (re)building it first when the JSON files in
+    channel_directory are newer than the artifact.
+    """
+    if channel_directory is not None:
+        paths = glob.glob(os.path.join(channel_directory, '*.json'))
+        newest = max((os.path.getmtime(path) for path in paths), default=0)
+        if not os.path.exists(filename) or os.path.getmtime(filename) < newest or not isCurrent(filename):
+            return compileDatabase(channel_directory, filename)
+
+    return ChannelDatabase(filename)
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('usage: {} CHANNEL_DIRECTORY OUTPUT'.format(sys.argv[0]))
+        sys.exit(1)
+
+    database = compileDatabase(sys.argv[1], sys.argv[2])
+    print('{0} channels compiled into {1}'.format(len(database), sys.argv[2]))
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+
+import concurrent.futures
+import os
+import subprocess
+import time
+
+import networkx
+
+import SafeChain.InvariantPolicy as MyInvariantPolicy
+import SafeChain.Statistics as MyStatistics
+import SafeChain.TraceParser as MyTraceParser
+
+class CompositionalChecker:
+    """
+    Check an invariant one weakly connected component of the variable
+    dependency graph at a time. Components only share the free attack input,
+    so every top-level conjunct of the invariant holds in the whole home iff it
+    holds in the components it mentions.
+    """
+    def __init__(self, controller, max_workers=None):
+        self.controller = controller
+        self.max_workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+
+    def getComponents(self, policy):
+        graph = self.controller.getDependencyGraph()
+        for condition in policy.getConditions():
+            graph.add_nodes_from(condition.getVariables())
+
+        return [frozenset(component) for component in networkx.weakly_connected_components(graph)]
+
+    def splitConjuncts(self, infix_tokens):
+        # drop parentheses around the whole expression
+        while len(infix_tokens) > 2 and infix_tokens[0] == '(' and infix_tokens[-1] == ')':
+            depth = 0
+            for index, token in enumerate(infix_tokens):
+                if token == '(':
+                    depth += 1
+                elif token == ')':
+                    depth -= 1
+                if depth == 0:
+                    break
+            if index != len(infix_tokens) - 1:
+                break
+            infix_tokens = infix_tokens[1:-1]
+
+        conjuncts = [[]]
+        depth = 0
+        for token in infix_tokens:
+            if token == '(':
+                depth += 1
+            elif token == ')':
+                depth -= 1
+            elif depth == 0 and token == '|':
+                # '&' binds tighter, so a top-level '|' cannot be split
+                return [list(infix_tokens)]
+            elif depth == 0 and token == '&':
+                conjuncts.append([])
+                continue
+
+            conjuncts[-1].append(token)
+
+        if len(conjuncts) == 1:
+            return conjuncts
+
+        return [conjunct for tokens in conjuncts for conjunct in self.splitConjuncts(tokens)]
+
+    def toString(self, infix_tokens):
+        return ' '.join(token if isinstance(token, str) else ' '.join(token.original) for token in infix_tokens)
+
+    def getSubPolicies(self, policy):
+        """
+        Return [(InvariantPolicy, variables)] with one policy per group of
+        conjuncts that touch the same components.
+        """
+        components = self.getComponents(policy)
+        component_of = dict()
+        for index, component in enumerate(components):
+            for channel_variable in component:
+                component_of[channel_variable] = index
+
+        groups = list()
+        for tokens in self.splitConjuncts(policy.boolean.infix_tokens):
+            indices = set(component_of[channel_variable]
+                          for token in tokens if not isinstance(token, str)
+                          for channel_variable in token.getVariables())
+            conjuncts = [tokens]
+
+            for group in [group for group in groups if group[0] & indices]:
+                groups.remove(group)
+                indices |= group[0]
+                conjuncts = group[1] + conjuncts
+
+            groups.append((indices, conjuncts))
+
+        sub_policies = list()
+        for indices, conjuncts in groups:
+            string = ' & '.join('( {} )'.format(self.toString(tokens)) for tokens in conjuncts)
+            variables = frozenset().union(*(components[index] for index in indices))
+            sub_policies.append((MyInvariantPolicy.InvariantPolicy(string), variables))
+
+        return sub_policies
+
+    def prepare(self, sub_policy, grouping, bmc, trace):
+        controller = self.controller
+        if grouping:
+            with controller.stats.timer('grouping'):
+                controller.grouping(sub_policy)
+        else:
+            controller.ungrouping(sub_policy)
+
+        with controller.stats.timer('pruning'):
+            controller.pruning(sub_policy)
+        controller.recordGroups(controller.stats)
+
+        with controller.stats.timer('policy'), controller.stats.timer('emission'):
+            model = sub_policy.dumpNumvModel(controller)
+        controller.stats.increment('model_size', len(model))
+
+        # the cached transitions are replaced, never mutated, by the next group
+        return model, controller.getTransitions(), controller.getVariableOrder(), controller.getCacheKey(model, bmc, trace)
+
+    def checkModel(self, model, order, timeout, bmc, trace):
+        """
+        Run on a worker thread and return (filename, raw result, checking
+        time, Statistics of this component), attribution is left to check.
+        """
+        controller = self.controller
+        stats = MyStatistics.Statistics()
+        controller.setThreadStatistics(stats)
+        try:
+            with stats.timer('writing'):
+                filename = controller.stageModel(model, 'component-')
+
+            checking_start = time.perf_counter()
+            parser = MyTraceParser.TraceParser(trace=trace)
+            try:
+                result = controller.runNuSMV(model, filename, timeout, bmc, parser, order)
+            except subprocess.TimeoutExpired:
+                return controller.getArtifact(filename), None, timeout, stats
+            finally:
+                controller.releaseModel(filename)
+            return controller.getArtifact(filename), result, time.perf_counter() - checking_start, stats
+        finally:
+            controller.setThreadStatistics(None)
+
+    def mergeResults(self, components):
+        results = [component['result'] for component in components]
+
+        failed = [result for result in results if result is not None and result['result'] == 'FAILED']
+        if len(failed) != 0:
+            # components run side by side, so the shortest failing trace is a counterexample for the home
+            merged = dict(min(failed, key=lambda result: len(result.get('states', ()))))
+        elif any(result is None for result in results):
+            return None
+        elif all(result['result'] == 'SUCCESS' for result in results):
+            merged = {'result': 'SUCCESS'}
+            bounds = [result['bound'] for result in results if 'bound' in result]
+            if len(bounds) != 0:
+                merged['bound'] = min(bounds)
+        else:
+            merged = {'result': 'UNKNOWN'}
+
+        merged['components'] = components
+        return merged
+
+    def check(self, policy, custom=True, grouping=False, timeout=1800, bmc=False, trace=True):
+        controller = self.controller
+        # every component is grouped and pruned on its own, the groups are those of all components
+        stats = controller.prepareCheck(policy, custom, None, False)
+        stats.groups.clear()
+
+        with stats.timer('policy'), stats.timer('splitting'):
+            sub_policies = self.getSubPolicies(policy)
+        stats.setCounter('components', len(sub_policies))
+
+        components = list()
+        jobs = list()
+        for sub_policy, variables in sub_policies:
+            # grouping and pruning stay out of the 'policy' timer, as in Controller.check
+            model, transitions, order, key = self.prepare(sub_policy, grouping, bmc, trace)
+            component = {'invariant': sub_policy.boolean.string,
+                         'variables': sorted(variables),
+                         'filename': None,
+                         'result': None}
+            components.append(component)
+
+            if key is not None:
+                with stats.timer('policy'):
+                    result = controller.cache.get(key)
+                    if result is not None:
+                        # only the verdict and traces are cached, the rules are those of this home
+                        stats.increment('cache_hits')
+                        component['result'] = sub_policy.getResult(result, controller, transitions)
+                if component['result'] is not None:
+                    continue
+
+            jobs.append((component, key, sub_policy, model, transitions, order))
+
+        controller.unpruning(policy)
+
+        with stats.timer('policy'):
+            checking_time = 0
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = dict((executor.submit(self.checkModel, model, order, timeout, bmc, trace), (component, key, sub_policy, transitions))
+                               for component, key, sub_policy, model, transitions, order in jobs)
+
+            for future, (component, key, sub_policy, transitions) in futures.items():
+                filename, result, component_time, component_stats = future.result()
+                stats.merge(component_stats)
+                component['filename'] = filename
+                checking_time = max(checking_time, component_time)
+                if result is None:
+                    continue
+
+                if key is not None and result['result'] != 'UNKNOWN':
+                    controller.cache.put(key, result)
+                component['result'] = sub_policy.getResult(result, controller, transitions)
+
+            result = self.mergeResults(components)
+
+        # the models of the components are listed under result['components']
+        return controller.finishCheck(policy, None, result, checking_time)
@@ -1,13 +1,29 @@
 #!/usr/bin/env python3
 
-import copy
 import re
+import sys
+
+VARIABLE_PATTERN = re.compile(r'\w+\.\w+')
+
+def internToken(token):
+    if VARIABLE_PATTERN.fullmatch(token):
+        return sys.intern(token)
+    return token
 
 class Condition:
+    __slots__ = ('original', 'tupple', 'string', 'variables')
+    # bumped by every change of a tuple, Boolean.getString renders again when it moved
+    generation = 0
+
     def __init__(self, tupple):
-        self.original = copy.copy(tupple)
-        self.tupple = copy.copy(tupple)
-        self.variable_pattern = re.compile('\w+\.\w+')
+        self.original = tuple(internToken(token) for token in tupple)
+        self.setTuple(self.original)
+
+    def setTuple(self, tupple):
+        self.tupple = tupple
+        self.string = None
+        self.variables = None
+        Condition.generation += 1
 
     def getConstraints(self):
         if len(self.tupple) != 3:
@@ -19,48 +35,50 @@ class Condition:
         subject, operator, value = self.tupple
         channel_name, variable_name = subject.split('.')
 
-        if self.variable_pattern.fullmatch(value):
+        if VARIABLE_PATTERN.fullmatch(value):
             # assign variable to variable or comparison between variables
             yield (channel_name, variable_name, '≡', value)
         else:
             yield (channel_name, variable_name, operator, value)
 
     def getVariables(self):
-        for token in self.tupple:
-            if self.variable_pattern.fullmatch(token) == None:
-                continue
+        if self.variables is None:
+            self.variables = tuple(tuple(token.split('.'))
+                                   for token in self.tupple
+                                   if VARIABLE_PATTERN.fullmatch(token))
 
-            channel_name, variable_name = token.split('.')
-            yield (channel_name, variable_name)
+        return iter(self.variables)
 
     def toEquivalentCondition(self, controller):
-        if len(self.tupple) != 3:
+        # start from the original so that shared conditions may be converted twice
+        if len(self.original) != 3:
             return
 
-        subject, operator, value = self.tupple
-        if self.variable_pattern.fullmatch(value):
+        subject, operator, value = self.original
+        if VARIABLE_PATTERN.fullmatch(value):
             # assign variable to variable or comparison between variables
             return
 
         channel_name, variable_name = subject.split('.')
-        channel = controller.getDevice(channel_name)
+        channel = controller.getChannel(channel_name)
         variable = channel.getVariable(variable_name)
         if operator != '←':
             operator, value = variable.getEquivalentTriggerCondition(operator, value)
         else:
             value = variable.getEquivalentActionCondition(value)
 
-        if value != '{}':
-            self.tupple = (subject, operator, value)
-        else:
-            self.tupple = ('FALSE', )
+        tupple = (subject, operator, value) if value != '{}' else ('FALSE', )
+        if tupple != self.tupple:
+            self.setTuple(tupple)
 
     def toOriginal(self):
-        self.tupple = copy.copy(self.original)
+        if self.tupple is not self.original:
+            self.setTuple(self.original)
 
     def getString(self):
-        return ' '.join(self.tupple)
+        if self.string is None:
+            self.string = ' '.join(self.tupple)
+        return self.string
 
     def getTuple(self):
         return self.tupple
-
@@ -12,6 +12,7 @@
 
 import pickle
 import collections
+import itertools
 import random
 import re
 import networkx
@@ -21,10 +22,25 @@ import pprint
 import time
 import os
 import tempfile
+import threading
+import io
+import asyncio
 
 import SafeChain.Trigger as MyTrigger
 import SafeChain.Action as MyAction
 import SafeChain.Rule as MyRule
+import SafeChain.Boolean as MyBoolean
+import SafeChain.Evaluator as MyEvaluator
+import SafeChain.TemplateCompiler as MyTemplateCompiler
+import SafeChain.Statistics as MyStatistics
+import SafeChain.CompositionalChecker as MyCompositionalChecker
+import SafeChain.NuSMVPool as MyNuSMVPool
+import SafeChain.AbstractionRefinement as MyAbstractionRefinement
+import SafeChain.ProgressiveBMC as MyProgressiveBMC
+import SafeChain.Portfolio as MyPortfolio
+import SafeChain.Workspace as MyWorkspace
+import SafeChain.ExplicitEngine as MyExplicitEngine
+import SafeChain.ChannelDatabase as MyChannelDatabase
 
 class Controller:
     def __init__(self, database):
@@ -35,6 +51,54 @@ class Controller:
         self.vulnerables = set()
 
         self.channel_variables = set()
+        self.evaluator = MyEvaluator.Evaluator()
+        self.compiler = MyTemplateCompiler.TemplateCompiler()
+        self.pool = None
+        self.limiter = None
+        self.workspace = None
+        self.cache = None
+        self.local = threading.local()
+        self.stats = MyStatistics.Statistics()
+        self.statistics_hook = None
+        self.initial_predicate = None
+        self.initial_exclusions = list()
+        self.inputs = dict()
+        self.ordering = False
+        self.dynamic_reordering = False
+        self.explicit_threshold = 10 ** 6
+        self.bdd_pattern = re.compile(r'(Number of BDD and ADD nodes|Peak number of nodes|Peak number of live nodes): (\d+)')
+
+        # derived data, see invalidate()
+        self.transitions = None
+        self.active_variables = None
+
+    @property
+    def stats(self):
+        # a worker thread may collect into its own Statistics, see setThreadStatistics
+        stats = getattr(self.local, 'stats', None)
+        return stats if stats is not None else self.shared_stats
+
+    @stats.setter
+    def stats(self, stats):
+        self.shared_stats = stats
+
+    def setThreadStatistics(self, stats):
+        # None goes back to the Statistics of the check
+        self.local.stats = stats
+
+    def __getstate__(self):
+        # the Statistics of worker threads stay with their threads
+        state = dict(self.__dict__)
+        del state['local']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.local = threading.local()
+
+    def invalidate(self):
+        self.transitions = None
+        self.active_variables = None
 
     def getFeasibleChannels(self):
         return self.database.items()
@@ -42,6 +106,7 @@ class Controller:
     def addChannel(self, channel):
         channel_name = channel.name
         self.channels[channel_name] = channel
+        self.invalidate()
 
     def addVulnerableChannel(self, channel_name):
         if channel_name not in self.channels:
@@ -51,6 +116,7 @@ class Controller:
         for variable_name in channel.getVariableNames():
             self.vulnerables.add((channel_name, variable_name))
 
+        self.invalidate()
         return True
 
     def addVulnerableChannelVariable(self, channel_name, variable_name):
@@ -62,6 +128,7 @@ class Controller:
             return False
 
         self.vulnerables.add((channel_name, variable_name))
+        self.invalidate()
         return True
 
     def getFeasibleInputs(self, input_definitions, parameters, forbid=set()):
@@ -94,25 +161,25 @@ class Controller:
         exceptions = set(input_definition['exceptions']) if 'exceptions' in input_definition else set()
         return feasible_inputs - exceptions
 
-    def getFeasibleInputsForTrigger(self, channel_name, trigger_name, forbid=set()):
+    def getFeasibleInputsForTrigger(self, channel_name, trigger_name, forbid=set(), rng=random):
         input_definitions = self.database[channel_name]['triggers'][trigger_name]['input']
         parameters = list()
 
         feasible_inputs = self.getFeasibleInputs(input_definitions, parameters)
         while feasible_inputs != None:
-            feasible_input = random.choice(tuple(feasible_inputs))
+            feasible_input = rng.choice(sorted(feasible_inputs, key=str))
             parameters.append(feasible_input)
             feasible_inputs = self.getFeasibleInputs(input_definitions, parameters, forbid)
 
         return tuple(parameters)
 
-    def getFeasibleInputsForAction(self, channel_name, action_name, forbid=set()):
+    def getFeasibleInputsForAction(self, channel_name, action_name, forbid=set(), rng=random):
         input_definitions = self.database[channel_name]['actions'][action_name]['input']
         parameters = list()
 
         feasible_inputs = self.getFeasibleInputs(input_definitions, parameters, forbid)
         while feasible_inputs != None:
-            feasible_input = random.choice(tuple(feasible_inputs))
+            feasible_input = rng.choice(sorted(feasible_inputs, key=str))
             parameters.append(feasible_input)
             feasible_inputs = self.getFeasibleInputs(input_definitions, parameters, forbid)
 
@@ -121,10 +188,15 @@ class Controller:
     def addRule(self, rule_name,
                 trigger_channel_name, trigger_name, trigger_inputs,
                 action_channel_name, action_name, action_inputs):
+        if isinstance(self.database, MyChannelDatabase.ChannelDatabase):
+            # the database carries the templates already parsed
+            for channel_name in (trigger_channel_name, action_channel_name):
+                self.compiler.addTemplates(*self.database.getTemplates(channel_name))
+
         trigger_definition = self.database[trigger_channel_name]['triggers'][trigger_name]
-        trigger = MyTrigger.Trigger(rule_name, trigger_channel_name, trigger_definition, trigger_name, trigger_inputs)
+        trigger = MyTrigger.Trigger(rule_name, trigger_channel_name, trigger_definition, trigger_name, trigger_inputs, self.compiler)
         action_definition = self.database[action_channel_name]['actions'][action_name]
-        action = MyAction.Action(rule_name, action_channel_name, action_definition, action_name, action_inputs)
+        action = MyAction.Action(rule_name, action_channel_name, action_definition, action_name, action_inputs, self.compiler)
 
         #  print(trigger_name, trigger_inputs, action_name, action_inputs)
         #  print(list(trigger.getConditions())[0].tupple)
@@ -134,11 +206,13 @@ class Controller:
         for channel_name, variable_name in rule.getVariables():
             self.channel_variables.add((channel_name, variable_name))
 
+        self.invalidate()
+
     def addCustomRule(self, rule_name,
                       trigger_channel_name, trigger_name, trigger_definition, trigger_inputs,
                       action_channel_name, action_name, action_definition, action_inputs):
-        trigger = MyTrigger.Trigger(rule_name, trigger_channel_name, trigger_definition, trigger_name, trigger_inputs)
-        action = MyAction.Action(rule_name, action_channel_name, action_definition, action_name, action_inputs)
+        trigger = MyTrigger.Trigger(rule_name, trigger_channel_name, trigger_definition, trigger_name, trigger_inputs, self.compiler)
+        action = MyAction.Action(rule_name, action_channel_name, action_definition, action_name, action_inputs, self.compiler)
 
         rule = MyRule.Rule(rule_name, trigger, action)
         self.rules.append(rule)
@@ -146,6 +220,312 @@ class Controller:
         for channel_name, variable_name in rule.getVariables():
             self.channel_variables.add((channel_name, variable_name))
 
+        self.invalidate()
+
+    def setWorkerPool(self, pool):
+        self.pool = pool
+
+    def setConcurrencyLimiter(self, limiter):
+        # an asyncio.Semaphore, usually shared by every controller of the event loop, bounds the NuSMV processes of checkAsync
+        self.limiter = limiter
+
+    def setWorkspace(self, workspace):
+        # where models are handed to NuSMV, the shared RAM-backed workspace by default
+        self.workspace = workspace
+
+    def setKeepArtifacts(self, keep=True):
+        # debugging: keep every model and command file NuSMV was run on
+        self.workspace = MyWorkspace.Workspace(keep=keep)
+
+    def getWorkspace(self):
+        if self.workspace is not None:
+            return self.workspace
+        return MyWorkspace.getDefaultWorkspace()
+
+    def setExplicitThreshold(self, threshold=10 ** 6):
+        # homes whose model has at most threshold transitions (states times branching) skip NuSMV, None always runs NuSMV
+        self.explicit_threshold = threshold
+
+    def getExplicitEngine(self, policy, bmc=False):
+        # a BMC run is asked for explicitly
+        if self.explicit_threshold is None or bmc:
+            return None
+
+        engine = MyExplicitEngine.ExplicitEngine(self)
+        if not engine.isApplicable(policy, self.explicit_threshold):
+            return None
+        return engine
+
+    def setResultCache(self, cache):
+        self.cache = cache
+
+    def setStatisticsHook(self, hook):
+        # hook(policy, stats) is called after every Controller.check
+        self.statistics_hook = hook
+
+    def setVariableOrdering(self, ordering=True, dynamic=False):
+        # BDD engine only: pass NuSMV an input order built by getVariableOrder and/or sift dynamically
+        self.ordering = ordering
+        self.dynamic_reordering = dynamic
+
+    def getVariableOrder(self, copies=None, shared=()):
+        """
+        Return the NuSMV input order, or None when ordering is off. Variables
+        follow the dependency graph breadth first, so a trigger sits next to
+        the actions it drives, and the copies of a self-composed variable are
+        interleaved (a.x, b.x). Shared variables live under s.
+        """
+        if not self.ordering:
+            return None
+
+        active_variables = self.getActiveVariables()
+        nodes = set((channel_name, variable_name)
+                    for channel_name, variable_names in active_variables.items()
+                    for variable_name in variable_names)
+        graph = self.getDependencyGraph().subgraph(nodes)
+
+        ordered = list()
+        components = sorted((sorted(component) for component in networkx.weakly_connected_components(graph)), key=lambda component: component[0])
+        for component in components:
+            sources = [node for node in component if graph.in_degree(node) == 0] or component[:1]
+            visited = set()
+            for source in sources:
+                if source in visited:
+                    continue
+                visited.add(source)
+                queue = collections.deque([source])
+                while len(queue) != 0:
+                    node = queue.popleft()
+                    ordered.append(node)
+                    for neighbor in sorted(set(graph.successors(node)) | set(graph.predecessors(node))):
+                        if neighbor not in visited:
+                            visited.add(neighbor)
+                            queue.append(neighbor)
+
+        prefixes = copies if copies is not None else ('',)
+        order = ['{}attack'.format(prefix) for prefix in prefixes]
+        for channel_name, variable_name in ordered:
+            if (channel_name, variable_name) in shared:
+                order.append('s.{0}.{1}'.format(channel_name, variable_name))
+                continue
+
+            for prefix in prefixes:
+                order.append('{0}{1}.{2}'.format(prefix, channel_name, variable_name))
+
+        return order
+
+    def recordBDDStatistics(self, lines):
+        for line in lines:
+            match = self.bdd_pattern.match(line.strip())
+            if match:
+                counter = {'Number of BDD and ADD nodes': 'bdd_nodes',
+                           'Peak number of nodes': 'bdd_peak_nodes',
+                           'Peak number of live nodes': 'bdd_peak_live_nodes'}[match.group(1)]
+                self.stats.increment(counter, int(match.group(2)))
+            yield line
+
+    def getNuSMVOptions(self, bmc=False, bmc_length=None):
+        options = ['-keep_single_value_vars'] + (['-bmc'] if bmc else [])
+        if bmc and bmc_length is not None:
+            options += ['-bmc_length', str(bmc_length)]
+        return options
+
+    def getCacheKey(self, model, bmc=False, trace=True, parser=()):
+        # parser tells apart entries of the same model stored in another shape, e.g. one result per specification
+        if self.cache is None:
+            return None
+
+        options = self.getNuSMVOptions(bmc) + ([] if trace else ['(no trace)']) + list(parser)
+        return self.cache.getKey(model, options)
+
+    def runNuSMV(self, model, filename, timeout, bmc=False, parser=None, order=None, bmc_length=None):
+        with self.stats.timer('nusmv'):
+            return self.executeNuSMV(model, filename, timeout, bmc, parser, order, bmc_length)
+
+    def executeNuSMV(self, model, filename, timeout, bmc=False, parser=None, order=None, bmc_length=None):
+        if bmc:
+            order = None
+        dynamic = self.dynamic_reordering and not bmc
+
+        if self.pool is not None:
+            output = self.pool.check(model, timeout, bmc, order, dynamic, bmc_length)
+            lines = self.recordBDDStatistics(io.StringIO(output))
+            if parser is None:
+                return ''.join(lines)
+            return parser.parse(lines)
+
+        if order is not None or dynamic:
+            return self.executeNuSMVCommands(model, filename, timeout, parser, order, dynamic)
+
+        cmds = ['NuSMV'] + self.getNuSMVOptions(bmc, bmc_length) + [filename]
+        return self.executeNuSMVProcess(cmds, timeout, parser)
+
+    def writeCommands(self, model, filename, order, dynamic):
+        # the steps of 'go' in a command file so that the BDD statistics can be printed
+        directory = self.getWorkspace().makeDirectory()
+        if filename is None:
+            # read_model is given the model file already written when there is one
+            filename = os.path.join(directory, 'model.smv')
+            with open(filename, 'w') as f:
+                f.write(model)
+
+        order_filename = None
+        if order is not None:
+            order_filename = os.path.join(directory, 'model.ord')
+            with open(order_filename, 'w') as f:
+                f.write('\n'.join(order) + '\n')
+
+        commands_filename = os.path.join(directory, 'commands')
+        with open(commands_filename, 'w') as f:
+            f.write('\n'.join(MyNuSMVPool.getCommands(filename, False, order_filename, dynamic) + ['quit']) + '\n')
+
+        return directory, ['NuSMV'] + self.getNuSMVOptions(False) + ['-source', commands_filename]
+
+    def executeNuSMVCommands(self, model, filename, timeout, parser, order, dynamic):
+        directory, cmds = self.writeCommands(model, filename, order, dynamic)
+        try:
+            return self.executeNuSMVProcess(cmds, timeout, parser)
+        finally:
+            self.getWorkspace().release(directory)
+
+    def executeNuSMVProcess(self, cmds, timeout, parser):
+        if parser is None:
+            p = subprocess.run(cmds, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+            return ''.join(self.recordBDDStatistics(p.stdout.decode('UTF-8').splitlines(True)))
+
+        # parse while NuSMV is still writing and stop it once the parser is done
+        p = subprocess.Popen(cmds, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            p.kill()
+
+        timer = threading.Timer(timeout, expire)
+        timer.start()
+        try:
+            result = parser.parse(self.recordBDDStatistics(p.stdout))
+        finally:
+            timer.cancel()
+            if p.poll() is None:
+                p.kill()
+            p.stdout.close()
+            p.wait()
+
+        if expired.is_set():
+            raise subprocess.TimeoutExpired(cmds, timeout)
+        return result
+
+    def writeModel(self, model, prefix='model-'):
+        return self.getWorkspace().write(model, prefix)
+
+    def stageModel(self, model, prefix='model-'):
+        # the file runNuSMV reads; a pool worker is handed the model itself, so there is none unless artifacts are kept
+        if self.pool is not None and not self.getWorkspace().keep:
+            return None
+        return self.writeModel(model, prefix)
+
+    def releaseModel(self, filename):
+        self.getWorkspace().release(filename)
+
+    def getArtifact(self, filename):
+        # the filename a check returns, a released model is gone unless the workspace keeps it
+        if self.getWorkspace().keep:
+            return filename
+        return None
+
+    async def stageModelAsync(self, model):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.stageModel, model)
+
+    async def runNuSMVAsync(self, model, filename, timeout, bmc=False, parser=None, order=None, bmc_length=None):
+        with self.stats.timer('nusmv'):
+            return await self.executeNuSMVAsync(model, filename, timeout, bmc, parser, order, bmc_length)
+
+    async def executeNuSMVAsync(self, model, filename, timeout, bmc=False, parser=None, order=None, bmc_length=None):
+        loop = asyncio.get_running_loop()
+        if bmc:
+            order = None
+        dynamic = self.dynamic_reordering and not bmc
+
+        if self.pool is not None:
+            # the pool blocks on its workers, keep it off the event loop
+            cancelled = threading.Event()
+            if self.limiter is not None:
+                await self.limiter.acquire()
+            try:
+                output = await loop.run_in_executor(None, self.pool.check, model, timeout, bmc, order, dynamic, bmc_length, cancelled)
+            except asyncio.CancelledError:
+                # the worker gives up the job and is restarted before it goes back to the pool
+                cancelled.set()
+                raise
+            finally:
+                if self.limiter is not None:
+                    self.limiter.release()
+
+            lines = self.recordBDDStatistics(io.StringIO(output))
+            if parser is None:
+                return ''.join(lines)
+            return parser.parse(lines)
+
+        if order is not None or dynamic:
+            directory, cmds = await loop.run_in_executor(None, self.writeCommands, model, filename, order, dynamic)
+            try:
+                return await self.executeNuSMVProcessAsync(cmds, timeout, parser)
+            finally:
+                self.getWorkspace().release(directory)
+
+        cmds = ['NuSMV'] + self.getNuSMVOptions(bmc, bmc_length) + [filename]
+        return await self.executeNuSMVProcessAsync(cmds, timeout, parser)
+
+    async def executeNuSMVProcessAsync(self, cmds, timeout, parser):
+        if self.limiter is not None:
+            await self.limiter.acquire()
+        try:
+            p = await asyncio.create_subprocess_exec(*cmds, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+            try:
+                stdout, _ = await asyncio.wait_for(p.communicate(), timeout)
+            except asyncio.TimeoutError:
+                raise subprocess.TimeoutExpired(cmds, timeout)
+            finally:
+                # timed out or cancelled
+                if p.returncode is None:
+                    p.kill()
+                    await p.wait()
+        finally:
+            if self.limiter is not None:
+                self.limiter.release()
+
+        lines = self.recordBDDStatistics(stdout.decode('UTF-8').splitlines(True))
+        if parser is None:
+            return ''.join(lines)
+        return parser.parse(lines)
+
+    def setInitialStates(self, predicate='TRUE', exclusions=()):
+        # None goes back to the single initial state given by Channel.setState
+        self.initial_predicate = None if predicate is None else MyBoolean.Boolean(predicate)
+        self.initial_exclusions = [dict(state) for state in exclusions]
+        self.invalidate()
+
+    def getInitialConditions(self):
+        if self.initial_predicate is not None:
+            yield from self.initial_predicate.getConditions()
+
+    def getInitialPredicate(self):
+        if self.initial_predicate is None:
+            return None
+
+        active_variables = self.getActiveVariables()
+        booleans = [self.initial_predicate.getString()]
+        for state in self.initial_exclusions:
+            values = ['{0} = {1}'.format(channel_variable, state[channel_variable])
+                      for channel_variable in sorted(state)
+                      if channel_variable.split('.')[1] in active_variables.get(channel_variable.split('.')[0], ())]
+            if len(values) != 0:
+                booleans.append('! ( {} )'.format(' & '.join(values)))
+
+        return ' & '.join('( {} )'.format(boolean) for boolean in booleans)
+
     def getChannel(self, channel_name):
         if channel_name not in self.channels:
             return None
@@ -153,6 +533,12 @@ class Controller:
         return self.channels[channel_name]
 
     def getTransitions(self):
+        if self.transitions is None:
+            self.transitions = self.buildTransitions()
+
+        return self.transitions
+
+    def buildTransitions(self):
         transitions = collections.defaultdict(list)
 
         # add rule
@@ -183,7 +569,7 @@ class Controller:
                 transitions[channel_variable].append(('TRUE', str(value), 'RESET'))
 
         # add attack
-        for channel_name, variable_name in self.vulnerables:
+        for channel_name, variable_name in sorted(self.vulnerables):
             channel = self.channels[channel_name]
             variable = channel.getVariable(variable_name)
             if variable.pruned:
@@ -199,30 +585,20 @@ class Controller:
                 variable_range = '{TRUE, FALSE}'
             transitions[channel_variable].insert(0, ('next(attack)', variable_range, 'ATTACK'))
 
-        return transitions
-
-    def checkRuleSatisfied(self, state, rule_condition):
-        string_list = list()
-
-        channel_names = list()
-        for channel_name, channel in self.channels.items():
-            if channel.pruned:
-                continue
-
-            variable_names = [variable_name
-                              for variable_name in channel.getVariableNames()
-                              if (channel_name, variable_name) in self.channel_variables
-                              and not channel.getVariable(variable_name).pruned]
+        return dict(transitions)
 
-            if len(variable_names) == 0:
-                continue
+    def getActiveVariables(self):
+        if self.active_variables is None:
+            self.active_variables = self.buildActiveVariables()
 
-            channel_names.append(channel_name)
-        channel_names = sorted(channel_names)
-        channel_names_string = ', '.join(['attack'] + channel_names)
+        return self.active_variables
 
-        for channel_name in channel_names:
+    def buildActiveVariables(self):
+        active_variables = dict()
+        for channel_name in sorted(self.channels):
             channel = self.channels[channel_name]
+            if channel.pruned:
+                continue
 
             variable_names = [variable_name
                               for variable_name in channel.getVariableNames()
@@ -232,143 +608,142 @@ class Controller:
             if len(variable_names) == 0:
                 continue
 
-            module_name = channel_name.upper()
-            string_list.append('MODULE {0}({1})'.format(module_name, channel_names_string))
+            active_variables[channel_name] = sorted(variable_names)
+
+        return active_variables
+
+    def getCompletenessThreshold(self, copies=1):
+        """
+        Number of steps after which a bounded search has seen every reachable
+        state. Sensors, attack and inputs take any value at every step, so a
+        shortest path never repeats the values of the variables driven by
+        rules after the initial state; their number of combinations (to the
+        power of the copies of a self-composed model) bounds its length.
+        """
+        threshold = 1
+        for channel_variable in self.getTransitions():
+            channel_name, variable_name = channel_variable.split('.')
+            threshold *= len(self.channels[channel_name].getVariable(variable_name).getPossibleGroups())
+        return threshold ** copies
+
+    def checkRuleSatisfied(self, state, rule_condition, next_state=None):
+        self.stats.increment('rule_checks')
+        return self.evaluator.evaluate(rule_condition, state, next_state)
+
+    def dumpChannelModule(self, module_name, parameters, channel_name, variable_names, forwarded, init, transitions):
+        string_list = []
+        channel = self.channels[channel_name]
+        string_list.append('MODULE {0}({1})'.format(module_name, parameters))
 
-            # define variables
-            variable_names = sorted(variable_names)
-            string_list.append('  FROZENVAR')
+        # define variables
+        if len(variable_names) != 0:
+            string_list.append('  VAR')
             for variable_name in variable_names:
                 variable = channel.getVariable(variable_name)
                 variable_range = variable.getPossibleGroupsInNuSMV()
                 string_list.append('    {0}: {1};'.format(variable_name, variable_range))
 
-            # initial conditions
-            string_list.append('  ASSIGN')
+        # free inputs, e.g. the undecided conditions of an abstraction
+        inputs = self.inputs.get(channel_name, ())
+        if len(inputs) != 0:
+            string_list.append('  IVAR')
+            for input_name in inputs:
+                string_list.append('    {0}: boolean;'.format(input_name))
+
+        # variables held by the shared module
+        if len(forwarded) != 0:
+            string_list.append('  DEFINE')
+            for variable_name in forwarded:
+                string_list.append('    {0} := shared.{0};'.format(variable_name))
+
+        # initial conditions
+        string_list.append('  ASSIGN')
+        if init and self.initial_predicate is None:
             for variable_name in variable_names:
                 variable = channel.getVariable(variable_name)
-                value = state['{0}.{1}'.format(channel_name, variable_name)]
+                value = variable.getEquivalentActionCondition(variable.value)
                 string_list.append('    init({0}):= {1};'.format(variable_name, value))
-            string_list.append('')
 
-        string_list.append('MODULE main')
-        string_list.append('  VAR')
-        for channel_name in channel_names:
-            module_name = channel_name.upper()
-            string_list.append('    {0}: {1}({2});'.format(channel_name, module_name, channel_names_string))
-
-        string_list.append('')
-        string_list.append('    attack: boolean;')
-        string_list.append('')
-        string_list.append('  ASSIGN attack := FALSE;')
-        string_list.append('')
-        string_list.append('  INVARSPEC {};'.format(rule_condition))
-
-        model = '\n'.join(string_list)
-
-        _, filename = tempfile.mkstemp()
-        with open(filename, 'w') as f:
-            f.write(model)
+            string_list.append('')
 
-        p = subprocess.run(['NuSMV', '-keep_single_value_vars', filename], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        output = p.stdout.decode('UTF-8')
-        os.remove(filename)
+        # rules
+        for variable_name in variable_names:
+            variable = channel.getVariable(variable_name)
+            channel_variable = '{0}.{1}'.format(channel_name, variable_name)
+            rules = transitions.get(channel_variable, [])
 
-        index = output.index('-- invariant')
-        output = output[index:]
+            if len(rules) == 0:
+                continue
 
-        lines = output.splitlines()
-        if lines[0].endswith('true'):
-            return True
-        else:
-            return False
+            if len(rules) == 1 and rules[0][0] == 'TRUE':
+                string_list.append('    next({0}):= {1};'.format(variable_name, rules[0][1]))
+            else:
+                string_list.append('    next({0}):='.format(variable_name))
+                string_list.append('      case')
+                for boolean, value, rule_name in rules:
+                    string_list.append('        {0}: {1};'.format(boolean, value))
+                if rules[-1][0] != 'TRUE':
+                    string_list.append('        {0}: {1};'.format('TRUE', variable_name))
+                string_list.append('      esac;')
 
-    def dumpNumvModel(self, name='main', init=True):
+        string_list.append('')
+        return string_list
+
+    def dumpNumvModel(self, name='main', init=True, shared=None):
+        """
+        shared is a set of (channel, variable) declared once in MODULE shared;
+        the model then takes that instance as parameter s and the channel
+        modules forward the variables with DEFINE.
+        """
         string_list = []
 
-        channel_names = list()
-        for channel_name, channel in self.channels.items():
-            if channel.pruned:
-                continue
-
-            variable_names = [variable_name
-                              for variable_name in channel.getVariableNames()
-                              if (channel_name, variable_name) in self.channel_variables
-                              and not channel.getVariable(variable_name).pruned]
-
-            if len(variable_names) == 0:
-                continue
+        active_variables = self.getActiveVariables()
+        channel_names = list(active_variables)
+        shared = shared if shared is not None else set()
 
-            channel_names.append(channel_name)
-        channel_names = sorted(channel_names)
+        shared_variables = dict()
+        for channel_name, variable_names in active_variables.items():
+            variable_names = [variable_name for variable_name in variable_names if (channel_name, variable_name) in shared]
+            if len(variable_names) != 0:
+                shared_variables[channel_name] = variable_names
 
         channel_names_string = ', '.join(['attack'] + channel_names)
         transitions = self.getTransitions()
 
         for channel_name in channel_names:
-            channel = self.channels[channel_name]
-
-            variable_names = [variable_name
-                              for variable_name in channel.getVariableNames()
-                              if (channel_name, variable_name) in self.channel_variables
-                              and not channel.getVariable(variable_name).pruned]
-
-            if len(variable_names) == 0:
-                continue
-
-            module_name = channel_name.upper()
-            string_list.append('MODULE {0}({1})'.format(module_name, channel_names_string))
-
-            # define variables
-            variable_names = sorted(variable_names)
+            forwarded = shared_variables.get(channel_name, [])
+            variable_names = [variable_name for variable_name in active_variables[channel_name] if variable_name not in forwarded]
+            parameters = channel_names_string + (', shared' if len(forwarded) != 0 else '')
+            string_list.extend(self.dumpChannelModule(channel_name.upper(), parameters, channel_name, variable_names, forwarded, init, transitions))
+
+        if len(shared_variables) != 0:
+            shared_names_string = ', '.join(['attack'] + list(shared_variables))
+            for channel_name, variable_names in shared_variables.items():
+                module_name = '{}_SHARED'.format(channel_name.upper())
+                string_list.extend(self.dumpChannelModule(module_name, shared_names_string, channel_name, variable_names, [], init, transitions))
+
+            string_list.append('MODULE shared(attack)')
             string_list.append('  VAR')
-            for variable_name in variable_names:
-                variable = channel.getVariable(variable_name)
-                variable_range = variable.getPossibleGroupsInNuSMV()
-                string_list.append('    {0}: {1};'.format(variable_name, variable_range))
-
-            # initial conditions
-            string_list.append('  ASSIGN')
-            if init:
-                for variable_name in variable_names:
-                    variable = channel.getVariable(variable_name)
-                    value = variable.getEquivalentActionCondition(variable.value)
-                    string_list.append('    init({0}):= {1};'.format(variable_name, value))
-
-                string_list.append('')
-
-            # rules
-            for variable_name in variable_names:
-                variable = channel.getVariable(variable_name)
-                channel_variable = '{0}.{1}'.format(channel_name, variable_name)
-                rules = transitions[channel_variable]
-
-                if len(rules) == 0:
-                    continue
-
-                if len(rules) == 1 and rules[0][0] == 'TRUE':
-                    string_list.append('    next({0}):= {1};'.format(variable_name, rules[0][1]))
-                else:
-                    string_list.append('    next({0}):='.format(variable_name))
-                    string_list.append('      case')
-                    for boolean, value, rule_name in rules:
-                        string_list.append('        {0}: {1};'.format(boolean, value))
-                    if rules[-1][0] != 'TRUE':
-                        string_list.append('        {0}: {1};'.format('TRUE', variable_name))
-                    string_list.append('      esac;')
-
+            for channel_name in shared_variables:
+                string_list.append('    {0}: {1}_SHARED({2});'.format(channel_name, channel_name.upper(), shared_names_string))
             string_list.append('')
 
-        string_list.append('MODULE {}'.format(name))
+            string_list.append('MODULE {}(s)'.format(name))
+        else:
+            string_list.append('MODULE {}'.format(name))
+
         string_list.append('  VAR')
         for channel_name in channel_names:
             module_name = channel_name.upper()
-            string_list.append('    {0}: {1}({2});'.format(channel_name, module_name, channel_names_string))
+            arguments = channel_names_string + (', s.{}'.format(channel_name) if channel_name in shared_variables else '')
+            string_list.append('    {0}: {1}({2});'.format(channel_name, module_name, arguments))
 
         string_list.append('')
         string_list.append('    attack: boolean;')
         string_list.append('')
         string_list.append('  ASSIGN init(attack) := FALSE;')
+        if init and self.initial_predicate is not None:
+            string_list.append('  INIT {};'.format(self.getInitialPredicate()))
 
         return '\n'.join(string_list)
 
@@ -397,7 +772,8 @@ class Controller:
                         variable = channel.getVariable(variable_name)
                         variable.addConstraint(operator, value)
 
-        for channel_name, variable_name, operator, value in policy.getConstraints(self):
+        initial_constraints = (constraint for condition in self.getInitialConditions() for constraint in condition.getConstraints())
+        for channel_name, variable_name, operator, value in itertools.chain(policy.getConstraints(self), initial_constraints):
             if operator == '≡':
                 # two variables and make their constraints equivalent
                 channel = self.channels[channel_name]
@@ -424,9 +800,11 @@ class Controller:
             for condition in rule.getConditions():
                 condition.toEquivalentCondition(self)
 
-        for condition in policy.getConditions():
+        for condition in itertools.chain(policy.getConditions(), self.getInitialConditions()):
             condition.toEquivalentCondition(self)
 
+        self.invalidate()
+
     def ungrouping(self, policy):
         for channel_name, channel in self.channels.items():
             for variable_name, variable in channel.variables.items():
@@ -436,11 +814,14 @@ class Controller:
             for condition in rule.getConditions():
                 condition.toOriginal()
 
-        for condition in policy.getConditions():
+        for condition in itertools.chain(policy.getConditions(), self.getInitialConditions()):
             condition.toOriginal()
 
-    def pruning(self, policy):
+        self.invalidate()
+
+    def getDependencyGraph(self):
         graph = networkx.DiGraph()
+        graph.add_nodes_from(self.channel_variables)
 
         for rule in self.rules:
             rule_name = rule.name
@@ -456,18 +837,30 @@ class Controller:
 
                 graph[trigger_variable][action_variable]['rules'].add(rule_name)
 
+        return graph
+
+    def getConeOfInfluence(self, policy):
+        # variables the policy depends on: its related variables and everything that can drive them
+        graph = self.getDependencyGraph()
+
         target_nodes = set(policy.getRelatedVariables(self, graph))
+        # the initial predicate may tie otherwise unrelated variables together
+        target_nodes.update(variable for condition in self.getInitialConditions() for variable in condition.getVariables())
         explored_nodes = set()
         related_rules = set()
         while len(target_nodes) != 0:
             adjacent_nodes = set()
-            for trigger_variable, action_variable, data in graph.in_edges_iter(nbunch=target_nodes, data=True):
+            for trigger_variable, action_variable, data in graph.in_edges(target_nodes, data=True):
                 adjacent_nodes.add(trigger_variable)
                 related_rules |= data['rules']
 
             explored_nodes |= target_nodes
             target_nodes = adjacent_nodes - explored_nodes
 
+        return explored_nodes
+
+    def pruning(self, policy):
+        explored_nodes = self.getConeOfInfluence(policy)
         for channel_name, channel in self.channels.items():
             for variable_name, variable in channel.variables.items():
                 if (channel_name, variable_name) in explored_nodes:
@@ -475,38 +868,137 @@ class Controller:
                 else:
                     variable.setPruned(True)
 
+        self.invalidate()
+
     def unpruning(self, policy):
         for channel_name, channel in self.channels.items():
             for variable_name, variable in channel.variables.items():
                 variable.setPruned(False)
 
-    def check(self, policy, custom=True, grouping=False, pruning=False, timeout=1800, bmc=False):
+        self.invalidate()
+
+    def prepareCheck(self, policy, custom, grouping, pruning):
+        stats = MyStatistics.Statistics()
+        self.stats = stats
+
         if custom:
-            for channel_name, channel in self.channels.items():
-                channel.addCustomRules(self)
+            with stats.timer('custom'):
+                for channel_name, channel in self.channels.items():
+                    channel.addCustomRules(self)
 
         if grouping == True:
-            grouping_start = time.perf_counter()
-            self.grouping(policy)
-            grouping_time = time.perf_counter() - grouping_start
+            with stats.timer('grouping'):
+                self.grouping(policy)
         elif grouping == False:
             self.ungrouping(policy)
-            grouping_time = 0
-        else:
-            grouping_time = 0
+
+        stats.setCounter('rules', len(self.rules))
+        stats.setCounter('variables_before_pruning', len(self.channel_variables))
 
         if pruning == True:
-            pruning_start = time.perf_counter()
-            self.pruning(policy)
-            pruning_time = time.perf_counter() - pruning_start
+            with stats.timer('pruning'):
+                self.pruning(policy)
         elif pruning == False:
             self.unpruning(policy)
-            pruning_time = 0
-        else:
-            pruning_time = 0
 
-        total_start = time.perf_counter()
-        filename, result, checking_time = policy.check(self, timeout, bmc)
-        total_time = time.perf_counter() - total_start
+        self.recordGroups(stats)
+        return stats
 
-        return filename, result, grouping_time, pruning_time, total_time - checking_time, checking_time
+    def recordGroups(self, stats):
+        # adds the variables of the current model to those already recorded
+        for channel_name, variable_names in self.getActiveVariables().items():
+            channel = self.channels[channel_name]
+            for variable_name in variable_names:
+                variable = channel.getVariable(variable_name)
+                stats.groups['{0}.{1}'.format(channel_name, variable_name)] = len(variable.getPossibleGroups())
+        stats.setCounter('variables_after_pruning', len(stats.groups))
+
+    def finishCheck(self, policy, filename, result, checking_time):
+        stats = self.stats
+        grouping_time = stats.getTime('grouping')
+        pruning_time = stats.getTime('pruning')
+        overhead = stats.getTime('policy') - checking_time
+
+        if self.statistics_hook is not None:
+            self.statistics_hook(policy, stats)
+
+        return MyStatistics.CheckResult((filename, result, grouping_time, pruning_time, overhead, checking_time), stats)
+
+    def check(self, policy, custom=True, grouping=False, pruning=False, timeout=1800, bmc=False, trace=True):
+        stats = self.prepareCheck(policy, custom, grouping, pruning)
+        with stats.timer('policy'):
+            engine = self.getExplicitEngine(policy, bmc)
+            if engine is not None:
+                filename, result, checking_time = engine.check(policy, timeout, trace)
+            else:
+                filename, result, checking_time = policy.check(self, timeout, bmc, trace)
+        return self.finishCheck(policy, filename, result, checking_time)
+
+    async def checkAsync(self, policy, custom=True, grouping=False, pruning=False, timeout=1800, bmc=False, trace=True):
+        # NuSMV runs without blocking the event loop; one check at a time per controller
+        stats = self.prepareCheck(policy, custom, grouping, pruning)
+        with stats.timer('policy'):
+            engine = self.getExplicitEngine(policy, bmc)
+            if engine is not None:
+                # the search is CPU bound, keep it off the event loop
+                loop = asyncio.get_running_loop()
+                filename, result, checking_time = await loop.run_in_executor(None, engine.check, policy, timeout, trace)
+            else:
+                filename, result, checking_time = await policy.checkAsync(self, timeout, bmc, trace)
+        return self.finishCheck(policy, filename, result, checking_time)
+
+    def checkCompositional(self, policy, custom=True, grouping=False, timeout=1800, bmc=False, trace=True, max_workers=None):
+        # invariants only, every component is pruned to the part its conjuncts depend on
+        checker = MyCompositionalChecker.CompositionalChecker(self, max_workers)
+        return checker.check(policy, custom, grouping, timeout, bmc, trace)
+
+    def getInitialState(self, result):
+        trace = result['states'] if 'states' in result else result['states_A']
+        return dict((channel_variable, value) for channel_variable, value in trace[0].items() if channel_variable != 'attack')
+
+    def checkInitialStates(self, policy, predicate='TRUE', representatives=1, custom=True, grouping=False, pruning=False, timeout=1800, bmc=False):
+        """
+        Check the policy from every initial state satisfying predicate in one
+        run. While it fails, the violating initial state is excluded and the
+        check repeated, until `representatives` states have been collected or
+        no violating initial state is left ('complete').
+        """
+        self.setInitialStates(predicate)
+        try:
+            output = self.check(policy, custom, grouping, pruning, timeout, bmc)
+            stats = output.stats
+            result = output.result
+            if result is None or result['result'] != 'FAILED':
+                return output
+
+            initial_states = [self.getInitialState(result)]
+            last = result
+            while len(initial_states) < representatives:
+                self.setInitialStates(predicate, initial_states)
+                last = self.check(policy, False, grouping, pruning, timeout, bmc).result
+                stats.increment('initial_state_runs')
+                if last is None or last['result'] != 'FAILED':
+                    break
+                initial_states.append(self.getInitialState(last))
+
+            result['initial_states'] = initial_states
+            result['complete'] = last is not None and last['result'] == 'SUCCESS'
+            self.stats = stats
+            return output
+        finally:
+            self.setInitialStates(None)
+
+    def checkWithRefinement(self, policy, custom=True, pruning=False, timeout=1800, bmc=False, max_iterations=None):
+        # range grouping refined from counterexamples, see AbstractionRefinement
+        refinement = MyAbstractionRefinement.AbstractionRefinement(self)
+        return refinement.check(policy, custom, pruning, timeout, bmc, max_iterations)
+
+    def checkProgressive(self, policy, custom=True, grouping=False, pruning=False, timeout=1800, trace=True, schedule=None):
+        # BMC with increasing bounds up to getCompletenessThreshold, see ProgressiveBMC
+        progressive = MyProgressiveBMC.ProgressiveBMC(self, schedule)
+        return progressive.check(policy, custom, grouping, pruning, timeout, trace)
+
+    def checkPortfolio(self, policy, custom=True, grouping=False, pruning=False, timeout=1800, trace=True, engines=('bdd', 'bmc')):
+        # first conclusive verdict of several engines, see Portfolio
+        portfolio = MyPortfolio.Portfolio(self, engines)
+        return portfolio.check(policy, custom, grouping, pruning, timeout, trace)
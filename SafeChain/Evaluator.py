@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+
+import re
+
+class Evaluator:
+    def __init__(self):
+        self.token_pattern = re.compile(r'\{[^}]*\}|next\(\w+\)|!=|>=|<=|-?\d+\.\.-?\d+|-?\d+|[()!&|=<>+\-]|[^\s(){}!&|=<>+]+')
+        self.variable_pattern = re.compile(r'\w+\.\w+')
+        self.range_pattern = re.compile(r'(-?\d+)\.\.(-?\d+)')
+        self.comparators = ('=', '!=', '>', '<', '>=', '<=', 'in')
+        self.cache = dict()
+
+    def tokenize(self, string):
+        return self.token_pattern.findall(string)
+
+    def parser(self, string):
+        if string in self.cache:
+            return self.cache[string]
+
+        tokens = self.tokenize(string)
+        tree, index = self.parseOr(tokens, 0)
+        if index != len(tokens):
+            raise SyntaxError('Unexpected token {0!r} in {1!r}'.format(tokens[index], string))
+
+        self.cache[string] = tree
+        return tree
+
+    def parseOr(self, tokens, index):
+        tree, index = self.parseAnd(tokens, index)
+        operands = [tree]
+        while index < len(tokens) and tokens[index] == '|':
+            tree, index = self.parseAnd(tokens, index + 1)
+            operands.append(tree)
+
+        if len(operands) == 1:
+            return operands[0], index
+        return ('|', tuple(operands)), index
+
+    def parseAnd(self, tokens, index):
+        tree, index = self.parseNot(tokens, index)
+        operands = [tree]
+        while index < len(tokens) and tokens[index] == '&':
+            tree, index = self.parseNot(tokens, index + 1)
+            operands.append(tree)
+
+        if len(operands) == 1:
+            return operands[0], index
+        return ('&', tuple(operands)), index
+
+    def parseNot(self, tokens, index):
+        if index >= len(tokens):
+            raise SyntaxError('Unexpected end of boolean')
+
+        token = tokens[index]
+        if token == '!':
+            tree, index = self.parseNot(tokens, index + 1)
+            return ('!', tree), index
+
+        if token == '(':
+            tree, index = self.parseOr(tokens, index + 1)
+            if index >= len(tokens) or tokens[index] != ')':
+                raise SyntaxError('Missing closing parenthesis')
+            return tree, index + 1
+
+        return self.parseCondition(tokens, index)
+
+    def parseCondition(self, tokens, index):
+        left, index = self.parseOperand(tokens, index)
+        if index >= len(tokens) or tokens[index] not in self.comparators:
+            # a bare operand such as TRUE, FALSE or next(attack)
+            return ('bool', left), index
+
+        operator = tokens[index]
+        if operator == 'in':
+            values = self.parseSet(tokens[index + 1])
+            return ('in', left, values), index + 2
+
+        right, index = self.parseOperand(tokens, index + 1)
+        return (operator, left, right), index
+
+    def parseOperand(self, tokens, index):
+        left = self.parseAtom(tokens[index])
+        index += 1
+        while index < len(tokens) and tokens[index] in ('+', '-'):
+            right = self.parseAtom(tokens[index + 1])
+            left = (tokens[index], left, right)
+            index += 2
+
+        return left, index
+
+    def parseAtom(self, token):
+        if token.startswith('next(') and token.endswith(')'):
+            return ('next', token[5:-1])
+        if self.variable_pattern.fullmatch(token) or token == 'attack':
+            return ('var', token)
+        return ('value', token)
+
+    def parseSet(self, token):
+        match = self.range_pattern.fullmatch(token)
+        if match:
+            minValue, maxValue = int(match.group(1)), int(match.group(2))
+            return frozenset(str(value) for value in range(minValue, maxValue + 1))
+
+        token = token.replace('{', '').replace('}', '').replace(' ', '')
+        if token == '':
+            return frozenset()
+
+        values = set()
+        for value in token.split(','):
+            match = self.range_pattern.fullmatch(value)
+            if match:
+                values.update(str(i) for i in range(int(match.group(1)), int(match.group(2)) + 1))
+            else:
+                values.add(value)
+        return frozenset(values)
+
+    def getValue(self, operand, state, next_state):
+        kind = operand[0]
+        if kind == 'value':
+            return operand[1]
+        if kind == 'var':
+            return state[operand[1]]
+        if kind == 'next':
+            if next_state is None:
+                # the previous model fixed attack to FALSE outside the trace
+                return 'FALSE'
+            return next_state[operand[1]]
+
+        left = int(self.getValue(operand[1], state, next_state))
+        right = int(self.getValue(operand[2], state, next_state))
+        return str(left + right if kind == '+' else left - right)
+
+    def compare(self, operator, left, right):
+        if operator == '=':
+            if left == right:
+                return True
+            left, right = self.toInteger(left), self.toInteger(right)
+            return left is not None and left == right
+        if operator == '!=':
+            return not self.compare('=', left, right)
+
+        left, right = self.toInteger(left), self.toInteger(right)
+        if left is None or right is None:
+            raise TypeError('Non-numeric operand for {}'.format(operator))
+
+        if operator == '>':
+            return left > right
+        if operator == '<':
+            return left < right
+        if operator == '>=':
+            return left >= right
+        return left <= right
+
+    def toInteger(self, value):
+        try:
+            return int(value)
+        except ValueError:
+            return None
+
+    def evaluateTree(self, tree, state, next_state):
+        operator = tree[0]
+        if operator == '&':
+            return all(self.evaluateTree(operand, state, next_state) for operand in tree[1])
+        if operator == '|':
+            return any(self.evaluateTree(operand, state, next_state) for operand in tree[1])
+        if operator == '!':
+            return not self.evaluateTree(tree[1], state, next_state)
+        if operator == 'bool':
+            return self.getValue(tree[1], state, next_state) == 'TRUE'
+        if operator == 'in':
+            value = self.getValue(tree[1], state, next_state)
+            return value in tree[2]
+
+        left = self.getValue(tree[1], state, next_state)
+        right = self.getValue(tree[2], state, next_state)
+        return self.compare(operator, left, right)
+
+    def evaluate(self, boolean, state, next_state=None):
+        tree = self.parser(boolean)
+        return self.evaluateTree(tree, state, next_state)
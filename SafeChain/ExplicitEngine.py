@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+
+import collections
+import itertools
+import re
+import subprocess
+import time
+
+import SafeChain.InvariantPolicy as MyInvariantPolicy
+import SafeChain.PrivacyPolicy as MyPrivacyPolicy
+import SafeChain.TraceParser as MyTraceParser
+
+class ExplicitEngine:
+    """
+    Breadth-first search over the reachable states of the model NuSMV would
+    be given, for homes small enough that starting NuSMV costs more than the
+    search. A state is packed into one integer with a mixed-radix digit per
+    variable (and per copy for PrivacyPolicy). Violations come with a
+    shortest counterexample in the format of the policy parsers.
+    """
+    def __init__(self, controller):
+        self.controller = controller
+        self.evaluator = controller.evaluator
+        self.random_pattern = re.compile(r'{.+}|-?\d+\.\.-?\d+')
+        self.integer_pattern = re.compile(r'-?\d+')
+        self.policy = None
+        self.operands = dict()
+        self.memo = dict()
+
+    def isApplicable(self, policy, threshold):
+        if not isinstance(policy, (MyInvariantPolicy.InvariantPolicy, MyPrivacyPolicy.PrivacyPolicy)):
+            return False
+        if len(self.controller.inputs) != 0:
+            return False
+
+        self.setUp(policy)
+        return self.size * self.getBranching() <= threshold
+
+    def getSortKey(self, value):
+        if self.integer_pattern.fullmatch(value):
+            return (0, int(value), '')
+        return (1, 0, value)
+
+    def getDomain(self, variable):
+        domain = variable.getPossibleGroupsInNuSMV()
+        if domain == 'boolean':
+            return ['FALSE', 'TRUE']
+        return sorted(self.evaluator.parseSet(domain), key=self.getSortKey)
+
+    def setUp(self, policy):
+        controller = self.controller
+        self.policy = policy
+        self.memo = dict()
+        self.transitions = controller.getTransitions()
+
+        privacy = isinstance(policy, MyPrivacyPolicy.PrivacyPolicy)
+        self.copies = ('a.', 'b.') if privacy else ('', )
+        high = policy.variables if privacy else set()
+
+        # [(channel_variable, Variable, domain, high)]
+        self.variables = list()
+        for channel_name, variable_names in controller.getActiveVariables().items():
+            channel = controller.getChannel(channel_name)
+            for variable_name in variable_names:
+                variable = channel.getVariable(variable_name)
+                channel_variable = '{0}.{1}'.format(channel_name, variable_name)
+                self.variables.append((channel_variable, variable, self.getDomain(variable), (channel_name, variable_name) in high))
+
+        self.references = dict()
+        for channel_variable, rules in self.transitions.items():
+            references = set([channel_variable])
+            for boolean, value, rule_name in rules:
+                references.update(self.evaluator.variable_pattern.findall(boolean))
+                references.update(self.evaluator.variable_pattern.findall(value))
+            self.references[channel_variable] = sorted(references)
+
+        # slot 0 is attack, then every variable of every copy
+        self.domains = [['FALSE', 'TRUE']]
+        for copy in self.copies:
+            self.domains.extend(domain for channel_variable, variable, domain, high in self.variables)
+        self.indices = [dict((value, index) for index, value in enumerate(domain)) for domain in self.domains]
+
+        self.strides = list()
+        stride = 1
+        for domain in self.domains:
+            self.strides.append(stride)
+            stride *= len(domain)
+        self.size = stride
+
+    def getBranching(self):
+        branching = 2
+        for channel_variable, variable, domain, high in self.variables:
+            if channel_variable not in self.transitions:
+                choices = len(domain) ** (len(self.copies) if high else 1)
+            else:
+                choices = max(len(self.getValues(value, None)) if self.random_pattern.fullmatch(value) else 1
+                              for boolean, value, rule_name in self.transitions[channel_variable])
+                choices **= len(self.copies)
+            branching *= choices
+        return branching
+
+    def getValues(self, value, state):
+        if self.random_pattern.fullmatch(value):
+            return sorted(self.evaluator.parseSet(value), key=self.getSortKey)
+
+        if value not in self.operands:
+            self.operands[value] = self.evaluator.parseOperand(self.evaluator.tokenize(value), 0)[0]
+        return [self.evaluator.getValue(self.operands[value], state, None)]
+
+    def getSlot(self, copy_index, variable_index):
+        return 1 + copy_index * len(self.variables) + variable_index
+
+    def getDigit(self, slot, value):
+        index = self.indices[slot].get(value)
+        if index is None:
+            raise ValueError('{0} is out of the range of {1}'.format(value, self.domains[slot]))
+        return index * self.strides[slot]
+
+    def pack(self, states):
+        packed = self.getDigit(0, states[0]['attack'])
+        for copy_index, state in enumerate(states):
+            for variable_index, (channel_variable, variable, domain, high) in enumerate(self.variables):
+                packed += self.getDigit(self.getSlot(copy_index, variable_index), state[channel_variable])
+        return packed
+
+    def unpack(self, packed):
+        values = [domain[(packed // stride) % len(domain)] for domain, stride in zip(self.domains, self.strides)]
+        states = list()
+        for copy_index in range(len(self.copies)):
+            state = {'attack': values[0]}
+            for variable_index, (channel_variable, variable, domain, high) in enumerate(self.variables):
+                state[channel_variable] = values[self.getSlot(copy_index, variable_index)]
+            states.append(state)
+        return states
+
+    def getNextValues(self, channel_variable, state, next_attack):
+        """
+        Return (index of the case taken, possible next values, whether the
+        case picks a random value), following the case of dumpChannelModule.
+        """
+        key = (channel_variable, next_attack) + tuple(state.get(reference) for reference in self.references[channel_variable])
+        if key in self.memo:
+            return self.memo[key]
+
+        rules = self.transitions[channel_variable]
+        result = (len(rules), [state[channel_variable]], False)
+        next_state = {'attack': next_attack}
+        for case, (boolean, value, rule_name) in enumerate(rules):
+            if self.evaluator.evaluate(boolean, state, next_state):
+                result = (case, self.getValues(value, state), self.random_pattern.fullmatch(value) is not None)
+                break
+
+        self.memo[key] = result
+        return result
+
+    def getChoices(self, channel_variable, domain, high, states, next_attack):
+        coupled = len(self.copies) == 2 and not high
+        if channel_variable not in self.transitions:
+            # sensors are free, low ones read the same in both copies (INVAR)
+            if coupled:
+                return [(value, value) for value in domain]
+            return list(itertools.product(domain, repeat=len(self.copies)))
+
+        next_values = [self.getNextValues(channel_variable, state, next_attack) for state in states]
+        if coupled:
+            (case_a, values_a, random_a), (case_b, values_b, random_b) = next_values
+            if case_a == case_b and random_a:
+                # the same random case in both copies draws the same value (TRANS)
+                return [(value, value) for value in values_a if value in values_b]
+        return list(itertools.product(*(values for case, values, random in next_values)))
+
+    def getSuccessors(self, packed):
+        states = self.unpack(packed)
+        for next_attack in ('FALSE', 'TRUE'):
+            digits = [[self.getDigit(0, next_attack)]]
+            for variable_index, (channel_variable, variable, domain, high) in enumerate(self.variables):
+                choices = self.getChoices(channel_variable, domain, high, states, next_attack)
+                digits.append([sum(self.getDigit(self.getSlot(copy_index, variable_index), value) for copy_index, value in enumerate(choice))
+                               for choice in choices])
+
+            for combination in itertools.product(*digits):
+                yield sum(combination)
+
+    def getInitialValues(self, variable):
+        value = variable.getEquivalentActionCondition(variable.value)
+        if isinstance(value, bool):
+            value = 'TRUE' if value else 'FALSE'
+        return self.getValues(str(value), None)
+
+    def getInitialStates(self):
+        predicate = self.controller.getInitialPredicate()
+        if predicate is None:
+            choices = [self.getInitialValues(variable) for channel_variable, variable, domain, high in self.variables]
+        else:
+            choices = [domain for channel_variable, variable, domain, high in self.variables]
+
+        for values in itertools.product(*choices):
+            state = dict(zip((channel_variable for channel_variable, variable, domain, high in self.variables), values))
+            state['attack'] = 'FALSE'
+            if predicate is not None and not self.evaluator.evaluate(predicate, state):
+                continue
+
+            if len(self.copies) == 1:
+                yield self.pack([state])
+                continue
+
+            # the second copy agrees on everything but the secret
+            choices_b = [domain if high else [state[channel_variable]] for channel_variable, variable, domain, high in self.variables]
+            for values_b in itertools.product(*choices_b):
+                state_b = dict(zip((channel_variable for channel_variable, variable, domain, high in self.variables), values_b))
+                state_b['attack'] = 'FALSE'
+                yield self.pack([state, state_b])
+
+    def isViolated(self, packed):
+        states = self.unpack(packed)
+        if len(states) == 1:
+            return not self.evaluator.evaluate(self.policy.boolean.getString(), states[0])
+
+        state_a, state_b = states
+        return any(state_a[channel_variable] != state_b[channel_variable] for channel_variable in self.vulnerables)
+
+    def search(self, timeout):
+        start = time.perf_counter()
+        active_variables = self.controller.getActiveVariables()
+        self.vulnerables = ['{0}.{1}'.format(channel_name, variable_name)
+                            for channel_name, variable_name in sorted(self.controller.vulnerables)
+                            if variable_name in active_variables.get(channel_name, ())]
+
+        # the clock is read every 1024 generated states, a single expansion may generate a great many
+        generated = 0
+        parents = dict()
+        queue = collections.deque()
+        for packed in self.getInitialStates():
+            generated += 1
+            if generated % 1024 == 0 and time.perf_counter() - start > timeout:
+                raise subprocess.TimeoutExpired('explicit', timeout)
+
+            if packed in parents:
+                continue
+            parents[packed] = None
+            if self.isViolated(packed):
+                return packed, parents
+            queue.append(packed)
+
+        while len(queue) != 0:
+            packed = queue.popleft()
+            for successor in self.getSuccessors(packed):
+                generated += 1
+                if generated % 1024 == 0 and time.perf_counter() - start > timeout:
+                    raise subprocess.TimeoutExpired('explicit', timeout)
+
+                if successor in parents:
+                    continue
+                parents[successor] = packed
+                if self.isViolated(successor):
+                    return successor, parents
+                queue.append(successor)
+
+        return None, parents
+
+    def getTraces(self, packed, parents):
+        path = list()
+        while packed is not None:
+            path.append(packed)
+            packed = parents[packed]
+        path = [self.unpack(packed) for packed in reversed(path)]
+
+        traces = dict()
+        for copy_index, copy in enumerate(self.copies):
+            states = [states[copy_index] for states in path]
+            deltas = [dict((channel_variable, value) for channel_variable, value in state.items() if previous[channel_variable] != value)
+                      for previous, state in zip(states, states[1:])]
+            traces[copy if copy != '' else None] = MyTraceParser.Trace(dict(states[0]), deltas)
+        return traces
+
+    def check(self, policy, timeout, trace=True):
+        controller = self.controller
+        stats = controller.stats
+        transitions = controller.getTransitions()
+
+        checking_start = time.perf_counter()
+        with stats.timer('explicit'):
+            if self.policy is not policy:
+                self.setUp(policy)
+
+            try:
+                violation, parents = self.search(timeout)
+            except subprocess.TimeoutExpired:
+                return None, None, timeout
+            except ValueError:
+                # a rule drives a variable out of its range, NuSMV stops with an error as well
+                return None, {'result': 'UNKNOWN', 'engine': 'explicit'}, time.perf_counter() - checking_start
+        checking_time = time.perf_counter() - checking_start
+
+        stats.setCounter('explicit_states', len(parents))
+        stats.increment('engine_explicit')
+
+        if violation is None:
+            result = {'result': 'SUCCESS'}
+        else:
+            result = {'result': 'FAILED'}
+            if trace:
+                result['traces'] = self.getTraces(violation, parents)
+
+        result = policy.completeResult(result, controller, None, transitions)
+        result['engine'] = 'explicit'
+        return None, result, checking_time
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+import collections
+
+class IncrementalVerifier:
+    """
+    Keep the verdicts of a set of policies on a home up to date while rules
+    are added to its controller. A verdict only depends on the rules inside
+    the cone of influence of its policy (Controller.getConeOfInfluence), so
+    a policy is checked again only when that cone gained a rule or a variable;
+    every other verdict is reused.
+    """
+    def __init__(self, controller, grouping=True, pruning=True, timeout=1800, bmc=False, trace=True):
+        self.controller = controller
+        self.options = {'grouping': grouping, 'pruning': pruning, 'timeout': timeout, 'bmc': bmc, 'trace': trace}
+        self.policies = collections.OrderedDict()
+        self.verified = dict()
+        self.customized = set()
+
+        self.rechecked = list()
+        self.reused = list()
+
+    def addPolicy(self, name, policy):
+        self.policies[name] = policy
+        self.verified.pop(name, None)
+
+    def removePolicy(self, name):
+        self.policies.pop(name)
+        self.verified.pop(name, None)
+
+    def addCustomRules(self):
+        # Channel.addCustomRules is not idempotent, add the rules of every channel once as it comes into use
+        controller = self.controller
+        channel_names = set(channel_name for channel_name, variable_name in controller.channel_variables)
+        for channel_name, channel in controller.channels.items():
+            if channel_name in channel_names and channel_name not in self.customized:
+                self.customized.add(channel_name)
+                channel.addCustomRules(controller)
+
+    def getContent(self, rule):
+        # the rendered strings, unlike getTransitions, do not change under grouping
+        situations = tuple((None if boolean is None else boolean.string, assignment.string) for boolean, assignment in rule.action.situations)
+        return (rule.name, rule.trigger.boolean.string, situations)
+
+    def getSignature(self, policy):
+        controller = self.controller
+        variables = frozenset(controller.getConeOfInfluence(policy))
+        # a rule belongs to the cone when it drives one of its variables
+        rules = frozenset(self.getContent(rule) for rule in controller.rules
+                          if any(action_variable in variables for trigger_variable, action_variable in rule.getDependencies()))
+        vulnerables = tuple(sorted(variable for variable in controller.vulnerables if variable in variables))
+
+        if controller.initial_predicate is None:
+            # the single initial state given by Channel.setState
+            initial = tuple((channel_name, variable_name, controller.getChannel(channel_name).getVariable(variable_name).value)
+                            for channel_name, variable_name in sorted(variables))
+        else:
+            # the rendered predicate follows grouping and pruning, the original string does not
+            initial = (controller.initial_predicate.string,
+                       tuple(tuple(sorted(state.items())) for state in controller.initial_exclusions))
+
+        options = (self.options['grouping'], self.options['pruning'], self.options['bmc'],
+                   tuple(sorted((channel_name, tuple(inputs)) for channel_name, inputs in controller.inputs.items())))
+        return (variables, rules, vulnerables, initial, options)
+
+    def getAffectedPolicies(self):
+        self.addCustomRules()
+
+        affected = list()
+        for name, policy in self.policies.items():
+            if name not in self.verified:
+                affected.append(name)
+                continue
+
+            signature, output = self.verified[name]
+            if output.result is None or output.result['result'] == 'UNKNOWN' or signature != self.getSignature(policy):
+                affected.append(name)
+
+        return affected
+
+    def verify(self):
+        """
+        Return {policy name: result of Controller.check}, checking only the
+        policies whose cone of influence changed since the last call.
+        """
+        controller = self.controller
+        affected = set(self.getAffectedPolicies())
+        self.rechecked = list()
+        self.reused = list()
+
+        outputs = collections.OrderedDict()
+        for name, policy in self.policies.items():
+            if name not in affected:
+                self.reused.append(name)
+                outputs[name] = self.verified[name][1]
+                continue
+
+            signature = self.getSignature(policy)
+            output = controller.check(policy, custom=False, **self.options)
+            output.stats.setCounter('reused_verdicts', len(self.policies) - len(affected))
+            self.verified[name] = (signature, output)
+            self.rechecked.append(name)
+            outputs[name] = output
+
+        return outputs
@@ -8,6 +8,7 @@ import time
 import os
 
 import SafeChain.Boolean as MyBoolean
+import SafeChain.TraceParser as MyTraceParser
 
 class InvariantPolicy:
     def __init__(self, string):
@@ -30,95 +31,120 @@ class InvariantPolicy:
         string_list.append('  INVARSPEC {};'.format(self.boolean.getString()))
         return '\n'.join(string_list)
 
-    def findWhichRules(self, previous_state, current_state, transitions, controller):
-        rules = set()
+    def findWhichRules(self, trace, transitions, controller):
+        rule_list = list()
 
-        for channel_variable in current_state:
-            current_value = current_state[channel_variable]
-            previous_value = previous_state[channel_variable]
+        for previous_state, delta in trace.getSteps():
+            rules = set()
 
-            if current_value == previous_value:
-                continue
+            for channel_variable, current_value in delta.items():
+                previous_value = previous_state[channel_variable]
 
-            if channel_variable not in transitions:
-                rules.add('ENV')
-                continue
+                if current_value == previous_value:
+                    continue
 
-            for boolean, value, rule_name in transitions[channel_variable]:
-                if boolean == 'next(attack)' and current_state['attack'] == 'TRUE':
-                    rules.add('ATTACK')
-                    break
+                if channel_variable not in transitions:
+                    rules.add('ENV')
+                    continue
 
-                if controller.checkRuleSatisfied(previous_state, boolean):
-                    rules.add(rule_name)
-                    break
+                for boolean, value, rule_name in transitions[channel_variable]:
+                    if boolean == 'next(attack)' and delta.get('attack', previous_state['attack']) == 'TRUE':
+                        rules.add('ATTACK')
+                        break
 
-        return rules
+                    if controller.checkRuleSatisfied(previous_state, boolean):
+                        rules.add(rule_name)
+                        break
 
-    def parseOutput(self, output, controller):
-        index = output.index('-- invariant')
-        output = output[index:]
+            rule_list.append(rules)
 
-        lines = output.splitlines()
-        lines = [line.strip() for line in lines]
-        if lines[0].endswith('true'):
-            return {'result': 'SUCCESS'}
+        return rule_list
 
-        transitions = controller.getTransitions()
-        states = list()
-        rules = list()
-        current_state = dict()
+    def getResult(self, result, controller, transitions=None):
+        if 'traces' not in result:
+            return result
 
-        # get initial state
-        index = 4
-        while index + 1 < len(lines):
-            index += 1
-            line = lines[index]
+        trace = result.pop('traces')[None]
+        if transitions is None:
+            transitions = controller.getTransitions()
+        result['states'] = trace
+        with controller.stats.timer('attribution'):
+            result['rules'] = self.findWhichRules(trace, transitions, controller)
+        return result
 
-            if line.startswith('-> State: 1.2 <-'):
-                break
+    def getParser(self, trace=True):
+        return MyTraceParser.TraceParser(trace=trace)
 
-            channel_variable, value = line.split(' = ')
-            current_state[channel_variable] = value
-        states.append(current_state)
+    def completeResult(self, result, controller, filename, transitions=None):
+        return self.getResult(result, controller, transitions)
 
-        while index + 1 < len(lines):
-            previous_state = current_state
-            current_state = copy.copy(previous_state)
+    def parseOutput(self, output, controller, trace=True):
+        parser = self.getParser(trace)
+        result = parser.parse(output.splitlines())
+        return self.getResult(result, controller)
 
-            while index + 1 < len(lines):
-                index += 1
-                line = lines[index]
+    def check(self, controller, timeout, bmc=False, trace=True):
+        stats = controller.stats
+        with stats.timer('emission'):
+            model = self.dumpNumvModel(controller)
+        stats.setCounter('model_size', len(model))
 
-                if line.startswith('-> State: '):
-                    break
+        key = controller.getCacheKey(model, bmc, trace)
+        if key is not None:
+            result = controller.cache.get(key)
+            if result is not None:
+                # only the verdict and traces are cached, the rules are those of this home
+                stats.increment('cache_hits')
+                return None, self.getResult(result, controller), 0
 
-                channel_variable, value = line.split(' = ')
-                current_state[channel_variable] = value
-
-            rule = self.findWhichRules(previous_state, current_state, transitions, controller)
-            states.append(current_state)
-            rules.append(rule)
-
-        return {'result': 'FAILED', 'states': states, 'rules': rules}
-
-    def check(self, controller, timeout):
-        model = self.dumpNumvModel(controller)
-        filename = '/tmp/r04922156/model {0} {2} {1}.smv'.format(os.getppid(), os.getpid(), datetime.datetime.now())
-        with open(filename, 'w') as f:
-            f.write(model)
+        with stats.timer('writing'):
+            filename = controller.stageModel(model)
 
         checking_start = time.perf_counter()
+        parser = self.getParser(trace)
         try:
-            p = subprocess.run(['NuSMV', '-keep_single_value_vars', filename], stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+            result = controller.runNuSMV(model, filename, timeout, bmc, parser, controller.getVariableOrder())
         except subprocess.TimeoutExpired:
-            return filename, None, timeout
+            return controller.getArtifact(filename), None, timeout
+        finally:
+            controller.releaseModel(filename)
         checking_time = time.perf_counter() - checking_start
 
-        output = p.stdout.decode('UTF-8')
-        result = self.parseOutput(output, controller)
+        if key is not None and result['result'] != 'UNKNOWN':
+            controller.cache.put(key, result)
+
+        result = self.getResult(result, controller)
+        return controller.getArtifact(filename), result, checking_time
+
+    async def checkAsync(self, controller, timeout, bmc=False, trace=True):
+        stats = controller.stats
+        with stats.timer('emission'):
+            model = self.dumpNumvModel(controller)
+        stats.setCounter('model_size', len(model))
 
-        return filename, result, checking_time
+        key = controller.getCacheKey(model, bmc, trace)
+        if key is not None:
+            result = controller.cache.get(key)
+            if result is not None:
+                # only the verdict and traces are cached, the rules are those of this home
+                stats.increment('cache_hits')
+                return None, self.getResult(result, controller), 0
 
+        with stats.timer('writing'):
+            filename = await controller.stageModelAsync(model)
+
+        checking_start = time.perf_counter()
+        parser = self.getParser(trace)
+        try:
+            result = await controller.runNuSMVAsync(model, filename, timeout, bmc, parser, controller.getVariableOrder())
+        except subprocess.TimeoutExpired:
+            return controller.getArtifact(filename), None, timeout
+        finally:
+            controller.releaseModel(filename)
+        checking_time = time.perf_counter() - checking_start
 
+        if key is not None and result['result'] != 'UNKNOWN':
+            controller.cache.put(key, result)
 
+        result = self.getResult(result, controller)
+        return controller.getArtifact(filename), result, checking_time
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import subprocess
+import time
+
+import SafeChain.InvariantPolicy as MyInvariantPolicy
+import SafeChain.TraceParser as MyTraceParser
+
+class MultiInvariantPolicy:
+    """
+    Several invariants checked against one model: every INVARSPEC is emitted
+    into the same file and NuSMV runs once. The result holds one entry per
+    policy under 'policies', in the order they were given.
+    """
+    def __init__(self, policies):
+        self.policies = [policy if isinstance(policy, MyInvariantPolicy.InvariantPolicy) else MyInvariantPolicy.InvariantPolicy(policy)
+                         for policy in policies]
+
+    def getConditions(self):
+        for policy in self.policies:
+            yield from policy.getConditions()
+
+    def getConstraints(self, controller):
+        for policy in self.policies:
+            yield from policy.getConstraints(controller)
+
+    def getRelatedVariables(self, controller, graph):
+        for policy in self.policies:
+            yield from policy.getRelatedVariables(controller, graph)
+
+    def dumpNumvModel(self, controller):
+        string_list = [controller.dumpNumvModel()]
+        string_list.append('')
+        for policy in self.policies:
+            string_list.append('  INVARSPEC {};'.format(policy.boolean.getString()))
+        return '\n'.join(string_list)
+
+    def getResult(self, results, controller):
+        transitions = controller.getTransitions()
+        policy_results = list()
+        for index, policy in enumerate(self.policies):
+            if index >= len(results):
+                # NuSMV stopped before reaching this specification
+                policy_results.append({'result': 'UNKNOWN'})
+                continue
+
+            policy_results.append(policy.getResult(results[index], controller, transitions))
+
+        return {'result': self.getVerdict(policy_results), 'policies': policy_results}
+
+    def getVerdict(self, results):
+        verdicts = set(result['result'] for result in results)
+        if len(results) < len(self.policies):
+            # NuSMV stopped before reaching every specification
+            verdicts.add('UNKNOWN')
+
+        if 'FAILED' in verdicts:
+            return 'FAILED'
+        elif verdicts == set(['SUCCESS']):
+            return 'SUCCESS'
+        return 'UNKNOWN'
+
+    def parseOutput(self, output, controller, trace=True):
+        parser = MyTraceParser.MultiTraceParser(trace=trace)
+        results = parser.parse(output.splitlines())
+        return self.getResult(results, controller)
+
+    def check(self, controller, timeout, bmc=False, trace=True):
+        stats = controller.stats
+        with stats.timer('emission'):
+            model = self.dumpNumvModel(controller)
+        stats.setCounter('model_size', len(model))
+        stats.setCounter('specifications', len(self.policies))
+
+        key = controller.getCacheKey(model, bmc, trace, ['(all specifications)'])
+        if key is not None:
+            results = controller.cache.get(key)
+            if results is not None:
+                # only the verdicts and traces are cached, the rules are those of this home
+                stats.increment('cache_hits')
+                return None, self.getResult(results, controller), 0
+
+        with stats.timer('writing'):
+            filename = controller.stageModel(model)
+
+        checking_start = time.perf_counter()
+        parser = MyTraceParser.MultiTraceParser(trace=trace)
+        try:
+            results = controller.runNuSMV(model, filename, timeout, bmc, parser, controller.getVariableOrder())
+        except subprocess.TimeoutExpired:
+            return controller.getArtifact(filename), None, timeout
+        finally:
+            controller.releaseModel(filename)
+        checking_time = time.perf_counter() - checking_start
+
+        if key is not None and self.getVerdict(results) != 'UNKNOWN':
+            controller.cache.put(key, results)
+
+        result = self.getResult(results, controller)
+        return controller.getArtifact(filename), result, checking_time
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+
+import concurrent.futures
+import os
+import queue
+import subprocess
+import threading
+import time
+
+import SafeChain.Workspace as MyWorkspace
+
+def getCommands(filename, bmc=False, order_filename=None, dynamic=False, bmc_length=None):
+    if bmc and bmc_length is not None:
+        # every bound up to bmc_length is reported on its own line
+        return ['read_model -i {}'.format(filename), 'go_bmc', 'check_ltlspec_bmc -k {}'.format(bmc_length)]
+    if bmc:
+        return ['read_model -i {}'.format(filename), 'go_bmc', 'check_invar_bmc']
+
+    # the steps of 'go', with the input order, reordering and BDD statistics in between
+    commands = ['read_model -i {}'.format(filename), 'flatten_hierarchy']
+    if order_filename is not None:
+        commands.append('encode_variables -i {}'.format(order_filename))
+    else:
+        commands.append('encode_variables')
+    if dynamic:
+        commands.append('dynamic_var_ordering -e sift')
+    commands += ['build_flat_model', 'build_model', 'print_bdd_stats', 'check_invar']
+    return commands
+
+class NuSMVWorker:
+    def __init__(self, options=('-keep_single_value_vars',), startup_timeout=30, workspace=None):
+        self.options = list(options)
+        self.startup_timeout = startup_timeout
+        # the model of every job is written into a directory of the (RAM-backed) workspace
+        self.workspace = workspace if workspace is not None else MyWorkspace.getDefaultWorkspace()
+        self.directory = self.workspace.makeDirectory('worker-')
+        self.filename = os.path.join(self.directory, 'model.smv')
+        self.order_filename = os.path.join(self.directory, 'model.ord')
+        self.process = None
+        self.lines = None
+        self.counter = 0
+
+        self.start()
+
+    def start(self):
+        self.process = subprocess.Popen(['NuSMV', '-int'] + self.options,
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        universal_newlines=True, bufsize=1)
+        self.lines = queue.Queue()
+        self.jobs = 0
+        reader = threading.Thread(target=self.read, args=(self.process.stdout, self.lines), daemon=True)
+        reader.start()
+
+        # consume the banner and make sure the shell answers
+        self.execute([], self.startup_timeout)
+
+    def read(self, stdout, lines):
+        for line in stdout:
+            lines.put(line)
+        lines.put(None)
+
+    def stop(self):
+        if self.process is None:
+            return
+
+        if self.process.poll() is None:
+            try:
+                self.process.stdin.write('quit\n')
+                self.process.stdin.flush()
+                self.process.wait(timeout=1)
+            except (OSError, ValueError, subprocess.TimeoutExpired):
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+
+    def restart(self):
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+        self.process = None
+        self.start()
+
+    def close(self):
+        self.stop()
+        self.workspace.release(self.directory)
+
+    def isAlive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def isHealthy(self, timeout=5):
+        if not self.isAlive():
+            return False
+
+        try:
+            self.execute([], timeout)
+        except (RuntimeError, subprocess.TimeoutExpired):
+            return False
+        return True
+
+    def execute(self, commands, timeout, cancelled=None):
+        # cancelled is a threading.Event polled while NuSMV runs
+        self.counter += 1
+        sentinel = '__SAFECHAIN_DONE_{}__'.format(self.counter)
+
+        try:
+            for command in commands:
+                self.process.stdin.write(command + '\n')
+            self.process.stdin.write('echo {}\n'.format(sentinel))
+            self.process.stdin.flush()
+        except OSError:
+            raise RuntimeError('NuSMV worker crashed')
+
+        output = list()
+        deadline = time.perf_counter() + timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                raise subprocess.TimeoutExpired(self.process.args, timeout)
+
+            try:
+                line = self.lines.get(timeout=remaining if cancelled is None else min(remaining, 0.1))
+            except queue.Empty:
+                if cancelled is not None and cancelled.is_set():
+                    raise concurrent.futures.CancelledError()
+                continue
+
+            if line is None:
+                raise RuntimeError('NuSMV worker crashed')
+
+            # the interactive prompt is printed without a newline
+            while line.startswith('NuSMV > '):
+                line = line[len('NuSMV > '):]
+
+            if line.rstrip('\n') == sentinel:
+                return ''.join(output)
+            output.append(line)
+
+    def check(self, model, timeout, bmc=False, order=None, dynamic=False, bmc_length=None, cancelled=None):
+        with open(self.filename, 'w') as f:
+            f.write(model)
+
+        order_filename = None
+        if order is not None:
+            order_filename = self.order_filename
+            with open(order_filename, 'w') as f:
+                f.write('\n'.join(order) + '\n')
+
+        commands = getCommands(self.filename, bmc, order_filename, dynamic, bmc_length) + ['reset']
+
+        self.jobs += 1
+        return self.execute(commands, timeout, cancelled)
+
+class NuSMVPool:
+    def __init__(self, size=None, options=('-keep_single_value_vars',), max_jobs=None, workspace=None):
+        self.size = size if size is not None else (os.cpu_count() or 1)
+        self.options = options
+        self.max_jobs = max_jobs
+
+        self.workers = [NuSMVWorker(options, workspace=workspace) for _ in range(self.size)]
+        self.idle = queue.Queue()
+        for worker in self.workers:
+            self.idle.put(worker)
+
+    def acquire(self):
+        worker = self.idle.get()
+        if not worker.isAlive():
+            worker.restart()
+        elif self.max_jobs is not None and worker.jobs >= self.max_jobs:
+            # recycle long-lived shells to bound their memory
+            worker.restart()
+        return worker
+
+    def release(self, worker):
+        self.idle.put(worker)
+
+    def check(self, model, timeout, bmc=False, order=None, dynamic=False, bmc_length=None, cancelled=None):
+        worker = self.acquire()
+        try:
+            if cancelled is not None and cancelled.is_set():
+                raise concurrent.futures.CancelledError()
+            try:
+                return worker.check(model, timeout, bmc, order, dynamic, bmc_length, cancelled)
+            except RuntimeError:
+                # restart on crash and give the job one more try
+                worker.restart()
+            try:
+                return worker.check(model, timeout, bmc, order, dynamic, bmc_length, cancelled)
+            except RuntimeError:
+                # the model itself brings NuSMV down: no output, which the parsers read as UNKNOWN
+                worker.restart()
+                return ''
+        except (subprocess.TimeoutExpired, concurrent.futures.CancelledError):
+            # the shell may still be busy with the job
+            worker.restart()
+            raise
+        finally:
+            self.release(worker)
+
+    def healthCheck(self, timeout=5):
+        healthy = 0
+        for _ in range(self.size):
+            worker = self.idle.get()
+            try:
+                if not worker.isHealthy(timeout):
+                    worker.restart()
+                else:
+                    healthy += 1
+            finally:
+                self.idle.put(worker)
+
+        return healthy
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
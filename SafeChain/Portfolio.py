@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+import collections
+import subprocess
+import threading
+import time
+
+# NuSMV options of every engine on top of Controller.getNuSMVOptions()
+ENGINES = collections.OrderedDict([
+    ('bdd', []),
+    ('bmc', ['-bmc']),
+    ('bdd-df', ['-df']),
+    ('bdd-dynamic', ['-dynamic']),
+])
+
+class Portfolio:
+    """
+    Run several NuSMV engines on the same model at once and keep the first
+    conclusive verdict; the other runs are killed. A bounded BMC pass is not
+    conclusive.
+    """
+    def __init__(self, controller, engines=('bdd', 'bmc')):
+        for engine in engines:
+            if engine not in ENGINES:
+                raise ValueError('Unknown engine {!r}'.format(engine))
+
+        self.controller = controller
+        self.engines = list(engines)
+
+    def isConclusive(self, result):
+        return result['result'] == 'FAILED' or (result['result'] == 'SUCCESS' and 'bound' not in result)
+
+    def runEngine(self, engine, filename, parser, race):
+        cmds = ['NuSMV'] + self.controller.getNuSMVOptions(False) + ENGINES[engine] + [filename]
+        start = time.perf_counter()
+
+        with race['lock']:
+            if race['done'].is_set():
+                return
+            p = subprocess.Popen(cmds, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+            race['processes'][engine] = p
+
+        try:
+            result = parser.parse(p.stdout)
+        except (OSError, ValueError):
+            # the pipe went away because another engine won
+            result = {'result': 'UNKNOWN'}
+        finally:
+            if p.poll() is None:
+                p.kill()
+            p.stdout.close()
+            p.wait()
+
+        with race['lock']:
+            race['results'][engine] = (result, time.perf_counter() - start)
+            if race['winner'] is None and self.isConclusive(result) and not race['done'].is_set():
+                race['winner'] = engine
+                race['done'].set()
+            elif len(race['results']) == len(self.engines):
+                race['done'].set()
+
+    def race(self, policy, filename, timeout, trace):
+        race = {
+            'lock': threading.Lock(),
+            'done': threading.Event(),
+            'processes': dict(),
+            'results': dict(),
+            'winner': None,
+        }
+
+        threads = [threading.Thread(target=self.runEngine, args=(engine, filename, policy.getParser(trace), race), daemon=True)
+                   for engine in self.engines]
+        for thread in threads:
+            thread.start()
+
+        race['done'].wait(timeout)
+        with race['lock']:
+            race['done'].set()
+            for p in race['processes'].values():
+                if p.poll() is None:
+                    p.kill()
+            # the losers clean up on their own threads
+            return race['winner'], dict(race['results'])
+
+    def checkPolicy(self, policy, timeout, trace=True):
+        controller = self.controller
+        stats = controller.stats
+        transitions = controller.getTransitions()
+
+        with stats.timer('emission'):
+            model = policy.dumpNumvModel(controller)
+        stats.setCounter('model_size', len(model))
+
+        with stats.timer('writing'):
+            filename = controller.writeModel(model)
+
+        checking_start = time.perf_counter()
+        try:
+            with stats.timer('nusmv'):
+                winner, results = self.race(policy, filename, timeout, trace)
+        finally:
+            controller.releaseModel(filename)
+        checking_time = time.perf_counter() - checking_start
+
+        for engine, (result, engine_time) in results.items():
+            stats.addTime('engine {}'.format(engine), engine_time)
+
+        kept = controller.getArtifact(filename)
+
+        if winner is None:
+            # no conclusive verdict: keep a bounded pass if there is one
+            bounded = [result for result, engine_time in results.values() if result['result'] == 'SUCCESS']
+            if len(bounded) != 0:
+                return kept, bounded[0], checking_time
+            if len(results) < len(self.engines):
+                return kept, None, timeout
+            # every engine stopped early without an answer
+            return kept, {'result': 'UNKNOWN'}, checking_time
+
+        stats.increment('engine_{}'.format(winner))
+        result = policy.completeResult(results[winner][0], controller, filename, transitions)
+        result['engine'] = winner
+        return kept, result, checking_time
+
+    def check(self, policy, custom=True, grouping=False, pruning=False, timeout=1800, trace=True):
+        controller = self.controller
+        stats = controller.prepareCheck(policy, custom, grouping, pruning)
+        with stats.timer('policy'):
+            filename, result, checking_time = self.checkPolicy(policy, timeout, trace)
+        return controller.finishCheck(policy, filename, result, checking_time)
@@ -12,6 +12,7 @@ import tempfile
 
 import SafeChain.Boolean as MyBoolean
 import SafeChain.InvariantPolicy as MyInvariantPolicy
+import SafeChain.TraceParser as MyTraceParser
 
 class PrivacyPolicy:
     def __init__(self, variables):
@@ -78,15 +79,32 @@ class PrivacyPolicy:
         result.append('next(a.{0}) = next(b.{0})'.format(channel_variable))
         return ' | '.join(result)
 
-    def getRandomTransitions(self, controller):
+    def getSharedVariables(self, controller):
+        # variables the secret cannot reach evolve identically in both copies
+        graph = controller.getDependencyGraph()
+        influenced = set(self.variables)
+        for channel_variable in self.variables:
+            if channel_variable in graph:
+                influenced.update(networkx.descendants(graph, channel_variable))
+
+        return set((channel_name, variable_name)
+                   for channel_name, variable_names in controller.getActiveVariables().items()
+                   for variable_name in variable_names
+                   if (channel_name, variable_name) not in influenced)
+
+    def getRandomTransitions(self, controller, shared=()):
         transitions = controller.getTransitions()
         high_variables = set('{}.{}'.format(channel_name, variable_name) for channel_name, variable_name in self.variables)
+        shared_variables = set('{}.{}'.format(channel_name, variable_name) for channel_name, variable_name in shared)
 
-        for channel_variable in transitions:
+        for channel_variable in sorted(transitions):
             if channel_variable in high_variables:
                 # H value variables
                 continue
 
+            if channel_variable in shared_variables:
+                continue
+
             previous = list()
             for boolean, value, rule_name in transitions[channel_variable]:
                 previous.append(boolean)
@@ -97,36 +115,51 @@ class PrivacyPolicy:
                 yield self.getRandomTransitionConstraint(previous, channel_variable)
 
     def dumpNumvModel(self, controller):
-        string_list = [controller.dumpNumvModel(name='home', init=False)]
+        # only the cone of influence of the secret is self-composed
+        shared = self.getSharedVariables(controller)
+        controller.stats.setCounter('shared_variables', len(shared))
+
+        string_list = [controller.dumpNumvModel(name='home', init=False, shared=shared)]
         string_list.append('')
         string_list.append('MODULE main')
         string_list.append('  VAR')
-        string_list.append('    a: home;')
-        string_list.append('    b: home;')
+        if len(shared) != 0:
+            string_list.append('    s: shared(a.attack);')
+            string_list.append('    a: home(s);')
+            string_list.append('    b: home(s);')
+        else:
+            string_list.append('    a: home;')
+            string_list.append('    b: home;')
         string_list.append('')
 
-        string_list.append('  ASSIGN')
-        for channel_name in sorted(controller.channels):
-            channel = controller.channels[channel_name]
-            for variable_name in sorted(channel.variables):
-                if (channel_name, variable_name) not in controller.channel_variables:
-                    continue
-
-                variable = channel.variables[variable_name]
-                if variable.pruned:
-                    continue
-
+        active_variables = dict()
+        for channel_name, variable_names in controller.getActiveVariables().items():
+            variable_names = [variable_name for variable_name in variable_names if (channel_name, variable_name) not in shared]
+            if len(variable_names) != 0:
+                active_variables[channel_name] = variable_names
+        initial_predicate = controller.getInitialPredicate()
+        if initial_predicate is None:
+            string_list.append('  ASSIGN')
+            for channel_name, variable_names in active_variables.items():
+                channel = controller.channels[channel_name]
+                for variable_name in variable_names:
+                    variable = channel.variables[variable_name]
+                    value = variable.getEquivalentActionCondition(variable.value)
+                    string_list.append('    init(a.{0}.{1}):= {2};'.format(channel_name, variable_name, value))
+            for channel_name, variable_name in sorted(shared):
+                variable = controller.channels[channel_name].variables[variable_name]
                 value = variable.getEquivalentActionCondition(variable.value)
-                string_list.append('    init(a.{0}.{1}):= {2};'.format(channel_name, variable_name, value))
-        string_list.append('    -- {}'.format(self.variables))
+                string_list.append('    init(s.{0}.{1}):= {2};'.format(channel_name, variable_name, value))
+        string_list.append('    -- {}'.format(sorted(self.variables)))
         string_list.append('')
 
+        if initial_predicate is not None:
+            string_list.append('  INIT {};'.format(self.getBooleanPrepend(initial_predicate, 'a.')))
+
         middle_and_lows = ['a.{0}.{1} = b.{0}.{1}'.format(channel_name, variable_name)
-                           for channel_name, channel in controller.channels.items()
-                           for variable_name in channel.getVariableNames()
-                           if (channel_name, variable_name) not in self.variables
-                           and (channel_name, variable_name) in controller.channel_variables
-                           and not channel.getVariable(variable_name).pruned]
+                           for channel_name, variable_names in active_variables.items()
+                           for variable_name in variable_names
+                           if (channel_name, variable_name) not in self.variables]
         if len(middle_and_lows) != 0:
             string_list.append('  INIT {};'.format(' & '.join(middle_and_lows)))
 
@@ -134,24 +167,21 @@ class PrivacyPolicy:
 
         transitions = controller.getTransitions()
         sensors = ['{0}.{1}'.format(channel_name, variable_name)
-                   for channel_name, channel in controller.channels.items()
-                   for variable_name in channel.getVariableNames()
+                   for channel_name, variable_names in active_variables.items()
+                   for variable_name in variable_names
                    if '{0}.{1}'.format(channel_name, variable_name) not in transitions
-                   and (channel_name, variable_name) not in self.variables
-                   and (channel_name, variable_name) in controller.channel_variables
-                   and not channel.getVariable(variable_name).pruned]
+                   and (channel_name, variable_name) not in self.variables]
         sensors = ['a.{0} = b.{0}'.format(sensor) for sensor in sensors]
         if len(sensors) != 0:
             string_list.append('  INVAR {0};'.format(' & '.join(sensors)))
 
-        for constraint in self.getRandomTransitions(controller):
+        for constraint in self.getRandomTransitions(controller, shared):
             string_list.append('  TRANS {0};'.format(constraint))
         string_list.append('')
 
         vulnerables = ['a.{0}.{1} = b.{0}.{1}'.format(channel_name, variable_name)
-                       for channel_name, variable_name in controller.vulnerables
-                       if not controller.getChannel(channel_name).getVariable(variable_name).pruned
-                       and (channel_name, variable_name) in controller.channel_variables]
+                       for channel_name, variable_name in sorted(controller.vulnerables)
+                       if variable_name in active_variables.get(channel_name, ())]
         if len(vulnerables) != 0:
             string_list.append('  INVARSPEC {};'.format(' & '.join(vulnerables)))
         else:
@@ -159,14 +189,13 @@ class PrivacyPolicy:
 
         return '\n'.join(string_list)
 
-    def findWhichRules(self, states, transitions, controller):
+    def findWhichRules(self, trace, transitions, controller):
         rule_list = list()
 
-        for previous_state, current_state in zip(states, states[1:]):
+        for previous_state, delta in trace.getSteps():
             rules = set()
 
-            for channel_variable in current_state:
-                current_value = current_state[channel_variable]
+            for channel_variable, current_value in delta.items():
                 previous_value = previous_state[channel_variable]
 
                 if current_value == previous_value:
@@ -177,7 +206,7 @@ class PrivacyPolicy:
                     continue
 
                 for boolean, value, rule_name in transitions[channel_variable]:
-                    if boolean == 'next(attack)' and current_state['attack'] == 'TRUE':
+                    if boolean == 'next(attack)' and delta.get('attack', previous_state['attack']) == 'TRUE':
                         rules.add('ATTACK')
                         break
 
@@ -189,67 +218,36 @@ class PrivacyPolicy:
 
         return rule_list
 
-    def parseOutput(self, output, controller, filename):
-        try:
-            index = output.index('-- ')
-        except ValueError:
+    def getResult(self, result, filename):
+        if result['result'] == 'UNKNOWN':
             print('Unexpected output:', filename)
-            return {'result': 'UNKNOWN'}
-        output = output[index:]
-
-        lines = output.splitlines()
-        lines = [line.strip() for line in lines]
-
-        if lines[0].endswith('true'):
-            return {'result': 'SUCCESS'}
 
+        if 'traces' not in result:
+            return result
 
-        states_A = list()
-        current_state_A = dict()
+        traces = result.pop('traces')
+        result['states_A'] = traces['a.']
+        result['states_B'] = traces['b.']
+        return result
 
-        states_B = list()
-        current_state_B = dict()
+    def getParser(self, trace=True):
+        return MyTraceParser.TraceParser(prefixes=('a.', 'b.'), trace=trace, shared='s.')
 
-        # get initial state
-        index = 4
-        while index + 1 < len(lines):
-            index += 1
-            line = lines[index]
+    def completeResult(self, result, controller, filename, transitions=None):
+        if transitions is None:
+            transitions = controller.getTransitions()
 
-            if line.startswith('-> State: 1.2 <-'):
-                break
-
-            channel_variable, value = line.split(' = ')
-            if channel_variable.startswith('a.'):
-                current_state_A[channel_variable[2:]] = value
-            else:
-                current_state_B[channel_variable[2:]] = value
-        states_A.append(current_state_A)
-        states_B.append(current_state_B)
-
-        while index + 1 < len(lines):
-            previous_state_A = current_state_A
-            current_state_A = copy.copy(previous_state_A)
-            previous_state_B = current_state_B
-            current_state_B = copy.copy(previous_state_B)
-
-            while index + 1 < len(lines):
-                index += 1
-                line = lines[index]
-
-                if line.startswith('-> State: '):
-                    break
-
-                channel_variable, value = line.split(' = ')
-                if channel_variable.startswith('a.'):
-                    current_state_A[channel_variable[2:]] = value
-                else:
-                    current_state_B[channel_variable[2:]] = value
-
-            states_A.append(current_state_A)
-            states_B.append(current_state_B)
+        result = self.getResult(result, filename)
+        if 'states_A' in result:
+            with controller.stats.timer('attribution'):
+                result['rules_A'] = self.findWhichRules(result['states_A'], transitions, controller)
+                result['rules_B'] = self.findWhichRules(result['states_B'], transitions, controller)
+        return result
 
-        return {'result': 'FAILED', 'states_A': states_A, 'states_B': states_B}
+    def parseOutput(self, output, controller, filename, trace=True):
+        parser = self.getParser(trace)
+        result = parser.parse(output.splitlines())
+        return self.getResult(result, filename)
 
     def checkReachable(self, controller, state):
         boolean = ' & '.join('{0} = {1}'.format(channel_variable, state[channel_variable]) for channel_variable in sorted(state) if channel_variable != 'attack')
@@ -257,30 +255,77 @@ class PrivacyPolicy:
         policy = MyInvariantPolicy.InvariantPolicy(boolean)
         return controller.check(policy, custom=False, pruning=None, grouping=None)
 
-    def check(self, controller, timeout, bmc):
+    def check(self, controller, timeout, bmc, trace=True):
         total_checking_time = 0
+        stats = controller.stats
         transitions = controller.getTransitions()
-        model = self.dumpNumvModel(controller) + '\n'
+        with stats.timer('emission'):
+            model = self.dumpNumvModel(controller) + '\n'
+        stats.setCounter('model_size', len(model))
+        order = controller.getVariableOrder(('a.', 'b.'), self.getSharedVariables(controller))
+
+        key = controller.getCacheKey(model, bmc, trace)
+        if key is not None:
+            result = controller.cache.get(key)
+            if result is not None:
+                # only the verdict and traces are cached, the rules are those of this home
+                stats.increment('cache_hits')
+                return None, self.completeResult(result, controller, None, transitions), 0
 
         while True:
-            _, filename = tempfile.mkstemp(suffix='.smv')
-            with open(filename, 'w') as f:
-                f.write(model)
+            with stats.timer('writing'):
+                filename = controller.stageModel(model)
 
             checking_start = time.perf_counter()
+            parser = self.getParser(trace)
             try:
-                cmds = ['NuSMV', '-keep_single_value_vars'] + (['-bmc'] if bmc else []) + [filename]
-                p = subprocess.run(cmds, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
+                result = controller.runNuSMV(model, filename, timeout, bmc, parser, order)
             except subprocess.TimeoutExpired:
-                return filename, None, timeout
+                return controller.getArtifact(filename), None, timeout
+            finally:
+                controller.releaseModel(filename)
             total_checking_time += time.perf_counter() - checking_start
 
             if total_checking_time >= timeout:
-                return filename, None, timeout
+                return controller.getArtifact(filename), None, timeout
 
-            output = p.stdout.decode('UTF-8')
-            result = self.parseOutput(output, controller, filename)
-            if result['result'] != 'SUCCESS':
-                result['rules_A'] = self.findWhichRules(result['states_A'], transitions, controller)
-                result['rules_B'] = self.findWhichRules(result['states_B'], transitions, controller)
-            return filename, result, total_checking_time
+            if key is not None and result['result'] != 'UNKNOWN':
+                controller.cache.put(key, result)
+
+            result = self.completeResult(result, controller, filename, transitions)
+            return controller.getArtifact(filename), result, total_checking_time
+
+    async def checkAsync(self, controller, timeout, bmc, trace=True):
+        stats = controller.stats
+        transitions = controller.getTransitions()
+        with stats.timer('emission'):
+            model = self.dumpNumvModel(controller) + '\n'
+        stats.setCounter('model_size', len(model))
+        order = controller.getVariableOrder(('a.', 'b.'), self.getSharedVariables(controller))
+
+        key = controller.getCacheKey(model, bmc, trace)
+        if key is not None:
+            result = controller.cache.get(key)
+            if result is not None:
+                # only the verdict and traces are cached, the rules are those of this home
+                stats.increment('cache_hits')
+                return None, self.completeResult(result, controller, None, transitions), 0
+
+        with stats.timer('writing'):
+            filename = await controller.stageModelAsync(model)
+
+        checking_start = time.perf_counter()
+        parser = self.getParser(trace)
+        try:
+            result = await controller.runNuSMVAsync(model, filename, timeout, bmc, parser, order)
+        except subprocess.TimeoutExpired:
+            return controller.getArtifact(filename), None, timeout
+        finally:
+            controller.releaseModel(filename)
+        checking_time = time.perf_counter() - checking_start
+
+        if key is not None and result['result'] != 'UNKNOWN':
+            controller.cache.put(key, result)
+
+        result = self.completeResult(result, controller, filename, transitions)
+        return controller.getArtifact(filename), result, checking_time
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+import subprocess
+import time
+
+import SafeChain.PrivacyPolicy as MyPrivacyPolicy
+
+class DepthParser:
+    # follows 'no counterexample found with bound k' lines so that a killed run still tells its depth
+    def __init__(self, parser):
+        self.parser = parser
+        self.bound = -1
+
+    def parse(self, lines):
+        for result in self.parser.parseSpecifications(lines):
+            if result['result'] == 'FAILED':
+                return result
+            if 'bound' in result:
+                self.bound = max(self.bound, result['bound'])
+
+        if self.bound < 0:
+            return {'result': 'UNKNOWN'}
+        return {'result': 'SUCCESS', 'bound': self.bound}
+
+class ProgressiveBMC:
+    """
+    Iterative deepening BMC. The invariant is checked as LTLSPEC G, which
+    NuSMV reports bound by bound, with the bounds of the schedule until a
+    violation is found or Controller.getCompletenessThreshold is reached;
+    reaching it turns the bounded pass into a proof ('complete').
+    """
+    def __init__(self, controller, schedule=None):
+        self.controller = controller
+        self.schedule = schedule
+
+    def getSchedule(self, threshold):
+        if self.schedule is not None:
+            bounds = sorted(bound for bound in self.schedule if bound < threshold)
+            return bounds + [threshold]
+
+        bounds = list()
+        bound = 1
+        while bound < threshold:
+            bounds.append(bound)
+            bound *= 2
+        return bounds + [threshold]
+
+    def toLTL(self, model):
+        string_list = list()
+        for line in model.split('\n'):
+            if line.startswith('  INVARSPEC '):
+                line = '  LTLSPEC G ( {} );'.format(line[len('  INVARSPEC '):].rstrip(';'))
+            string_list.append(line)
+        return '\n'.join(string_list)
+
+    def checkPolicy(self, policy, timeout, trace=True):
+        controller = self.controller
+        stats = controller.stats
+        transitions = controller.getTransitions()
+
+        copies = 2 if isinstance(policy, MyPrivacyPolicy.PrivacyPolicy) else 1
+        threshold = controller.getCompletenessThreshold(copies)
+        stats.setCounter('bmc_threshold', threshold)
+
+        with stats.timer('emission'):
+            model = self.toLTL(policy.dumpNumvModel(controller))
+        stats.setCounter('model_size', len(model))
+
+        with stats.timer('writing'):
+            filename = controller.stageModel(model)
+
+        try:
+            return self.deepen(policy, model, filename, threshold, timeout, trace, transitions)
+        finally:
+            controller.releaseModel(filename)
+
+    def deepen(self, policy, model, filename, threshold, timeout, trace, transitions):
+        controller = self.controller
+        stats = controller.stats
+
+        depth = -1
+        checking_start = time.perf_counter()
+        for bound in self.getSchedule(threshold):
+            remaining = timeout - (time.perf_counter() - checking_start)
+            if remaining <= 0:
+                break
+
+            parser = DepthParser(policy.getParser(trace))
+            try:
+                result = controller.runNuSMV(model, filename, remaining, True, parser, bmc_length=bound)
+            except subprocess.TimeoutExpired:
+                depth = max(depth, parser.bound)
+                break
+
+            depth = max(depth, parser.bound)
+            if result['result'] == 'FAILED':
+                # the violation lies just past the deepest clean bound
+                stats.setCounter('bmc_depth', depth + 1)
+                result = policy.completeResult(result, controller, filename, transitions)
+                return controller.getArtifact(filename), result, time.perf_counter() - checking_start
+
+            if depth >= threshold:
+                stats.setCounter('bmc_depth', depth)
+                return controller.getArtifact(filename), {'result': 'SUCCESS', 'bound': depth, 'complete': True}, time.perf_counter() - checking_start
+
+        # out of time: report how deep the search got
+        stats.setCounter('bmc_depth', max(depth, 0))
+        return controller.getArtifact(filename), {'result': 'UNKNOWN', 'bound': depth, 'complete': False}, time.perf_counter() - checking_start
+
+    def check(self, policy, custom=True, grouping=False, pruning=False, timeout=1800, trace=True):
+        controller = self.controller
+        stats = controller.prepareCheck(policy, custom, grouping, pruning)
+        with stats.timer('policy'):
+            filename, result, checking_time = self.checkPolicy(policy, timeout, trace)
+        return controller.finishCheck(policy, filename, result, checking_time)
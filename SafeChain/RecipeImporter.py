@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+
+import collections
+import csv
+import itertools
+import json
+import random
+import re
+
+import SafeChain.Channel as MyChannel
+
+class RecipeImporter:
+    """
+    Stream (trigger channel, trigger, action channel, action) recipes from TSV
+    or JSON-lines files into controllers. Rows are read lazily and only one
+    batch is held in memory at a time; rows that cannot be resolved against
+    the channel database are skipped and counted in self.counts.
+    """
+    def __init__(self, database, rng=None):
+        self.database = database
+        self.rng = rng if rng is not None else random.Random()
+        self.counts = collections.Counter()
+
+    def readRecipes(self, filename):
+        if filename.endswith('.jsonl') or filename.endswith('.json'):
+            rows = self.readJSONLines(filename)
+        else:
+            rows = self.readTSV(filename)
+
+        for index, row in enumerate(rows):
+            self.counts['rows'] += 1
+            try:
+                recipe = (row['triggerchannel'], row['trigger'], row['actionchannel'], row['action'])
+            except KeyError:
+                self.counts['malformed row'] += 1
+                continue
+
+            yield (row.get('id', index),) + recipe
+
+    def readTSV(self, filename):
+        with open(filename, newline='') as f:
+            yield from csv.DictReader(f, delimiter='\t')
+
+    def readJSONLines(self, filename):
+        with open(filename) as f:
+            for line in f:
+                line = line.strip()
+                if len(line) == 0:
+                    continue
+
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    self.counts['malformed row'] += 1
+
+    def resolve(self, recipes):
+        for recipe_id, trigger_channel, trigger, action_channel, action in recipes:
+            if trigger_channel not in self.database:
+                self.counts['unsupported trigger channel'] += 1
+                continue
+            if trigger not in self.database[trigger_channel].get('triggers', {}):
+                self.counts['unsupported trigger'] += 1
+                continue
+            if action_channel not in self.database:
+                self.counts['unsupported action channel'] += 1
+                continue
+            if action not in self.database[action_channel].get('actions', {}):
+                self.counts['unsupported action'] += 1
+                continue
+
+            self.counts['resolved'] += 1
+            yield (recipe_id, trigger_channel, trigger, action_channel, action)
+
+    def getInstanceName(self, channel_type):
+        return 'c_{}'.format(re.sub('[^a-z0-9]', '', channel_type.lower()))
+
+    def getRandomState(self, channel):
+        return {variable_name: self.rng.choice(sorted(possible_values, key=str))
+                for variable_name, possible_values
+                in sorted(channel.getPossibleValuesOfVariables().items())}
+
+    def ensureChannel(self, controller, channel_type):
+        for channel in controller.channels.values():
+            if channel.channel_name == channel_type:
+                return
+
+        channel = MyChannel.Channel(channel_type, self.database[channel_type], self.getInstanceName(channel_type))
+        channel.setState(self.getRandomState(channel))
+        controller.addChannel(channel)
+
+    def addRecipe(self, controller, recipe, create_channels=True):
+        recipe_id, trigger_channel, trigger, action_channel, action = recipe
+
+        if create_channels:
+            self.ensureChannel(controller, trigger_channel)
+            self.ensureChannel(controller, action_channel)
+
+        try:
+            trigger_inputs = controller.getFeasibleInputsForTrigger(trigger_channel, trigger, rng=self.rng)
+            action_inputs = controller.getFeasibleInputsForAction(action_channel, action, rng=self.rng)
+        except (KeyError, IndexError, TypeError):
+            # e.g. no instance of the channel in this home or an empty domain
+            self.counts['infeasible inputs'] += 1
+            return None
+
+        rule = ('RULE{}'.format(recipe_id), trigger_channel, trigger, trigger_inputs, action_channel, action, action_inputs)
+        controller.addRule(*rule)
+        self.counts['imported'] += 1
+        return rule
+
+    def batches(self, recipes, batch_size):
+        recipes = iter(recipes)
+        while True:
+            batch = list(itertools.islice(recipes, batch_size))
+            if len(batch) == 0:
+                return
+            yield batch
+
+    def importInto(self, controller, recipes, create_channels=True):
+        return [rule
+                for rule in (self.addRecipe(controller, recipe, create_channels) for recipe in recipes)
+                if rule is not None]
+
+    def feedControllers(self, filename, batch_size, controller_factory, create_channels=True):
+        """
+        Yield one controller per batch of batch_size resolved recipes, built by
+        controller_factory() and filled through addRule.
+        """
+        recipes = self.resolve(self.readRecipes(filename))
+        for batch in self.batches(recipes, batch_size):
+            controller = controller_factory()
+            self.importInto(controller, batch, create_channels)
+            yield controller
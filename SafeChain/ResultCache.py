@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+class ResultCache:
+    def __init__(self, directory, max_size=1 << 30):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        self.size = sum(size for filename, size, mtime in self.getEntries())
+
+    def getKey(self, model, options):
+        digest = hashlib.sha256()
+        digest.update(' '.join(options).encode('UTF-8'))
+        digest.update(b'\0')
+        digest.update(model.encode('UTF-8'))
+        return digest.hexdigest()
+
+    def getFilename(self, key):
+        return os.path.join(self.directory, key[:2], '{}.pickle'.format(key))
+
+    def getEntries(self):
+        for subdirectory in os.scandir(self.directory):
+            if not subdirectory.is_dir():
+                continue
+
+            for entry in os.scandir(subdirectory.path):
+                if not entry.name.endswith('.pickle'):
+                    continue
+
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # evicted by another process
+                    continue
+                yield (entry.path, stat.st_size, stat.st_mtime)
+
+    def get(self, key):
+        filename = self.getFilename(key)
+        try:
+            with open(filename, 'rb') as f:
+                result = pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+
+        # mtime doubles as the last access time for LRU eviction
+        try:
+            os.utime(filename)
+        except FileNotFoundError:
+            pass
+
+        self.hits += 1
+        return result
+
+    def put(self, key, result):
+        filename = self.getFilename(key)
+        directory = os.path.dirname(filename)
+        os.makedirs(directory, exist_ok=True)
+
+        # write then rename so concurrent readers never see a partial entry
+        fd, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.size += os.path.getsize(temporary)
+        os.replace(temporary, filename)
+
+        if self.size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        entries = sorted(self.getEntries(), key=lambda entry: entry[2])
+        self.size = sum(size for filename, size, mtime in entries)
+
+        for filename, size, mtime in entries:
+            if self.size <= self.max_size:
+                break
+
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+            self.size -= size
+
+    def clear(self):
+        for filename, size, mtime in list(self.getEntries()):
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                pass
+        self.size = 0
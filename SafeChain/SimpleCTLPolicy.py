@@ -114,22 +114,22 @@ class CTLPolicy:
 
     def check(self, controller, timeout, bmc):
         model = self.dumpNumvModel(controller)
-        _, filename = tempfile.mkstemp(suffix='.smv')
-        with open(filename, 'w') as f:
-            f.write(model)
+        filename = controller.writeModel(model)
 
         checking_start = time.perf_counter()
         try:
             cmds = ['NuSMV', '-keep_single_value_vars'] + (['-bmc'] if bmc else []) + [filename]
             p = subprocess.run(cmds, stdout=subprocess.PIPE, stderr=subprocess.PIPE, timeout=timeout)
         except subprocess.TimeoutExpired:
-            return filename, None, timeout
+            return controller.getArtifact(filename), None, timeout
+        finally:
+            controller.releaseModel(filename)
         checking_time = time.perf_counter() - checking_start
 
         output = p.stdout.decode('UTF-8')
         result = self.parseOutput(output, controller)
 
-        return filename, result, checking_time
+        return controller.getArtifact(filename), result, checking_time
 
 
 
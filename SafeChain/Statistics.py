@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import collections
+import contextlib
+import time
+
+class Statistics:
+    def __init__(self):
+        self.timers = collections.OrderedDict()
+        self.counters = collections.OrderedDict()
+        self.groups = dict()
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addTime(phase, time.perf_counter() - start)
+
+    def addTime(self, phase, seconds):
+        self.timers[phase] = self.timers.get(phase, 0) + seconds
+
+    def getTime(self, phase):
+        return self.timers.get(phase, 0)
+
+    def increment(self, counter, value=1):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def setCounter(self, counter, value):
+        self.counters[counter] = value
+
+    def getCounter(self, counter):
+        return self.counters.get(counter, 0)
+
+    def merge(self, other):
+        for phase, seconds in other.timers.items():
+            self.addTime(phase, seconds)
+        for counter, value in other.counters.items():
+            self.increment(counter, value)
+        self.groups.update(other.groups)
+
+    def asDict(self):
+        return {'timers': dict(self.timers), 'counters': dict(self.counters), 'groups': dict(self.groups)}
+
+    def __repr__(self):
+        return 'Statistics({!r})'.format(self.asDict())
+
+class CheckResult(tuple):
+    """
+    The (filename, result, grouping_time, pruning_time, overhead,
+    checking_time) tuple returned by Controller.check, with the detailed
+    Statistics of the run attached as .stats.
+    """
+    def __new__(cls, values, stats=None):
+        self = tuple.__new__(cls, values)
+        self.stats = stats
+        return self
+
+    @property
+    def filename(self):
+        return self[0]
+
+    @property
+    def result(self):
+        return self[1]
+
+    @property
+    def grouping_time(self):
+        return self[2]
+
+    @property
+    def pruning_time(self):
+        return self[3]
+
+    @property
+    def overhead(self):
+        return self[4]
+
+    @property
+    def checking_time(self):
+        return self[5]
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+import string
+
+import SafeChain.Boolean as MyBoolean
+import SafeChain.Assignment as MyAssignment
+import SafeChain.Condition as MyCondition
+
+class TemplateCompiler:
+    """
+    Parse trigger/action definition strings once into token templates with
+    placeholder slots, and hash-cons the instantiated Condition, Boolean and
+    Assignment objects. Conditions are shared by every rule of the owning
+    controller that instantiates the same condition, so one compiler must not
+    be shared between controllers.
+    """
+    def __init__(self):
+        self.formatter = string.Formatter()
+        self.boolean_templates = dict()
+        self.assignment_templates = dict()
+        self.conditions = dict()
+        self.booleans = dict()
+        self.assignments = dict()
+
+    def compileToken(self, token):
+        pieces = list()
+        for literal, field, format_spec, conversion in self.formatter.parse(token):
+            if field is None:
+                pieces.append((literal, None))
+                continue
+
+            if format_spec or conversion or not field.isdigit():
+                raise ValueError('Unsupported placeholder {!r}'.format(field))
+            pieces.append((literal, int(field)))
+
+        if len(pieces) == 1 and pieces[0][1] is None:
+            return pieces[0][0]
+        return tuple(pieces)
+
+    def bindToken(self, token, parameters):
+        if isinstance(token, str):
+            return token
+
+        return ''.join(literal if field is None else literal + parameters[field]
+                       for literal, field in token)
+
+    def compileBoolean(self, template):
+        # mirrors Boolean.parser on the unformatted tokens
+        tokens = template.split(' ')
+        items = []
+
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token in MyBoolean.OPERATORS:
+                items.append(token)
+                i += 1
+                continue
+
+            bool_condition = [token]
+            i += 1
+
+            while i < len(tokens) and tokens[i] not in MyBoolean.OPERATORS:
+                bool_condition.append(tokens[i])
+                bool_condition.append(tokens[i+1])
+                i += 2
+
+            items.append(tuple(self.compileToken(token) for token in bool_condition))
+
+        return tuple(items)
+
+    def compileAssignment(self, template):
+        # mirrors Assignment.parser on the unformatted tokens
+        items = []
+        for condition_string in template.split(','):
+            condition = condition_string.strip().split(' ')
+            items.append(tuple(self.compileToken(token) for token in condition))
+
+        return tuple(items)
+
+    def compileTemplates(self, definition):
+        """
+        Return ({boolean template: compiled}, {assignment template: compiled})
+        for every trigger and action of a channel definition; None marks a
+        template that must take the slow path.
+        """
+        booleans = list()
+        assignments = list()
+        for template_definitions in (definition.get('triggers', {}), definition.get('actions', {})):
+            for name, template_definition in template_definitions.items():
+                if isinstance(template_definition['definition'], dict):
+                    booleans.append(template_definition['definition']['boolean'])
+                    continue
+
+                for situation in template_definition['definition']:
+                    assignments.append(situation['assignment'])
+                    if 'boolean' in situation:
+                        booleans.append(situation['boolean'])
+
+        boolean_templates = dict()
+        for template in booleans:
+            try:
+                boolean_templates[template] = self.compileBoolean(template)
+            except ValueError:
+                boolean_templates[template] = None
+
+        assignment_templates = dict()
+        for template in assignments:
+            try:
+                assignment_templates[template] = self.compileAssignment(template)
+            except ValueError:
+                assignment_templates[template] = None
+
+        return boolean_templates, assignment_templates
+
+    def addTemplates(self, boolean_templates, assignment_templates):
+        # compiled ahead of time, e.g. by ChannelDatabase
+        self.boolean_templates.update(boolean_templates)
+        self.assignment_templates.update(assignment_templates)
+
+    def getCondition(self, tupple):
+        if tupple not in self.conditions:
+            self.conditions[tupple] = MyCondition.Condition(tupple)
+
+        return self.conditions[tupple]
+
+    def isBindable(self, parameters):
+        # parameters that would change the token structure need the slow path
+        for parameter in parameters:
+            if parameter in MyBoolean.OPERATORS or ' ' in parameter or ',' in parameter or parameter == '':
+                return False
+        return True
+
+    def getBoolean(self, template, parameters):
+        parameters = tuple(str(parameter) for parameter in parameters)
+        key = (template, parameters)
+        if key in self.booleans:
+            return self.booleans[key]
+
+        if not self.isBindable(parameters):
+            boolean = MyBoolean.Boolean(template.format(*parameters))
+            self.booleans[key] = boolean
+            return boolean
+
+        if template not in self.boolean_templates:
+            try:
+                self.boolean_templates[template] = self.compileBoolean(template)
+            except ValueError:
+                self.boolean_templates[template] = None
+
+        if self.boolean_templates[template] is None:
+            boolean = MyBoolean.Boolean(template.format(*parameters))
+            self.booleans[key] = boolean
+            return boolean
+
+        infix_tokens = list()
+        for item in self.boolean_templates[template]:
+            if isinstance(item, str):
+                infix_tokens.append(item)
+            else:
+                tupple = tuple(self.bindToken(token, parameters) for token in item)
+                infix_tokens.append(self.getCondition(tupple))
+
+        boolean = MyBoolean.Boolean(template.format(*parameters), tuple(infix_tokens))
+        self.booleans[key] = boolean
+        return boolean
+
+    def getAssignment(self, template, parameters):
+        parameters = tuple(str(parameter) for parameter in parameters)
+        key = (template, parameters)
+        if key in self.assignments:
+            return self.assignments[key]
+
+        if not self.isBindable(parameters):
+            assignment = MyAssignment.Assignment(template.format(*parameters))
+            self.assignments[key] = assignment
+            return assignment
+
+        if template not in self.assignment_templates:
+            try:
+                self.assignment_templates[template] = self.compileAssignment(template)
+            except ValueError:
+                self.assignment_templates[template] = None
+
+        if self.assignment_templates[template] is None:
+            assignment = MyAssignment.Assignment(template.format(*parameters))
+            self.assignments[key] = assignment
+            return assignment
+
+        conditions = list()
+        for item in self.assignment_templates[template]:
+            tupple = tuple(self.bindToken(token, parameters) for token in item)
+            conditions.append(self.getCondition(tupple))
+
+        assignment = MyAssignment.Assignment(template.format(*parameters), conditions)
+        self.assignments[key] = assignment
+        return assignment
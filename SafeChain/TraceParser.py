@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+import collections.abc
+import re
+
+class Trace(collections.abc.Sequence):
+    """
+    A counterexample stored as its initial state plus one dict of changed
+    variables per later step. Full states are only built when indexed or
+    iterated. inputs holds the changed input variables (IVAR) read by each
+    transition.
+    """
+    def __init__(self, initial=None, deltas=None, inputs=None):
+        self.initial = initial if initial is not None else dict()
+        self.deltas = deltas if deltas is not None else list()
+        self.inputs = inputs if inputs is not None else list()
+
+    def __len__(self):
+        return 1 + len(self.deltas)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+        if index < 0 or index >= len(self):
+            raise IndexError('trace index out of range')
+
+        state = dict(self.initial)
+        for delta in self.deltas[:index]:
+            state.update(delta)
+        return state
+
+    def __iter__(self):
+        state = dict(self.initial)
+        yield dict(state)
+        for delta in self.deltas:
+            state.update(delta)
+            yield dict(state)
+
+    def __eq__(self, other):
+        if isinstance(other, Trace):
+            return self.initial == other.initial and self.deltas == other.deltas
+        return list(self) == list(other)
+
+    def getSteps(self):
+        """
+        Yield (previous state, delta) for every transition. The previous state
+        is a single dict updated in place, so it must not be kept; it also
+        carries the inputs read by the transition.
+        """
+        state = dict(self.initial)
+        for index, delta in enumerate(self.deltas):
+            if index < len(self.inputs):
+                state.update(self.inputs[index])
+            yield state, delta
+            state.update(delta)
+
+class TraceParser:
+    def __init__(self, prefixes=None, trace=True, shared=None):
+        # prefixes split self-composed variables (a.x, b.x) into separate traces,
+        # variables under the shared prefix belong to all of them
+        self.prefixes = prefixes
+        self.shared = shared
+        self.trace = trace
+        self.bound_pattern = re.compile(r'-- no counterexample found with bound (\d+)')
+
+    def newTraces(self):
+        if self.prefixes is None:
+            return {None: Trace()}
+        return dict((prefix, Trace()) for prefix in self.prefixes)
+
+    def addValue(self, traces, target, line):
+        channel_variable, value = line.split(' = ', 1)
+        if self.prefixes is None:
+            target[None][channel_variable] = value
+            return
+
+        if self.shared is not None and channel_variable.startswith(self.shared):
+            for prefix in self.prefixes:
+                target[prefix][channel_variable[len(self.shared):]] = value
+            return
+
+        for prefix in self.prefixes:
+            if channel_variable.startswith(prefix):
+                target[prefix][channel_variable[len(prefix):]] = value
+                return
+
+    def getVerdict(self, line):
+        if line.endswith(' is true'):
+            return {'result': 'SUCCESS'}
+        if line.endswith(' is false'):
+            return {'result': 'FAILED'}
+
+        match = self.bound_pattern.match(line)
+        if match:
+            return {'result': 'SUCCESS', 'bound': int(match.group(1))}
+
+        return None
+
+    def parseSpecifications(self, lines):
+        """
+        Yield one result per specification found in the NuSMV output, in
+        order. A result is {'result': 'SUCCESS'} or {'result': 'FAILED',
+        'traces': {prefix: Trace}}; traces are omitted when not requested.
+        """
+        result = None
+        traces = None
+        target = None
+
+        for line in lines:
+            line = line.strip()
+
+            if line.startswith('-- '):
+                verdict = self.getVerdict(line)
+                if verdict is None:
+                    # e.g. '-- as demonstrated by ...' or '-- Loop starts here'
+                    continue
+
+                if result is not None:
+                    yield result
+
+                result = verdict
+                traces = None
+                target = None
+                if result['result'] == 'FAILED' and self.trace:
+                    # wait for the counterexample that follows
+                    traces = self.newTraces()
+                    result['traces'] = traces
+                else:
+                    yield result
+                    result = None
+                continue
+
+            if traces is None:
+                continue
+
+            if line.startswith('-> State: '):
+                if target is None:
+                    target = dict((prefix, trace.initial) for prefix, trace in traces.items())
+                else:
+                    target = dict()
+                    for prefix, trace in traces.items():
+                        trace.deltas.append(dict())
+                        target[prefix] = trace.deltas[-1]
+                continue
+
+            if line.startswith('-> Input: ') and target is not None:
+                # inputs are kept apart from the state, one dict per transition
+                target = dict()
+                for prefix, trace in traces.items():
+                    trace.inputs.append(dict())
+                    target[prefix] = trace.inputs[-1]
+                continue
+
+            if line.startswith('-> '):
+                target = collections.defaultdict(dict)
+                continue
+
+            if target is None or ' = ' not in line:
+                continue
+
+            self.addValue(traces, target, line)
+
+        if result is not None:
+            yield result
+
+    def parse(self, lines):
+        """
+        Return the result of the first specification, reading no further than
+        needed: without a requested trace the stream is abandoned as soon as
+        the verdict is known.
+        """
+        for result in self.parseSpecifications(lines):
+            return result
+
+        return {'result': 'UNKNOWN'}
+
+class MultiTraceParser(TraceParser):
+    def parse(self, lines):
+        # every specification of the model, in the order NuSMV checked them
+        return list(self.parseSpecifications(lines))
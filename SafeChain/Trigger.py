@@ -3,7 +3,7 @@
 import SafeChain.Boolean as MyBoolean
 
 class Trigger:
-    def __init__(self, rule_name, channel_name, definition, name, parameters):
+    def __init__(self, rule_name, channel_name, definition, name, parameters, compiler=None):
         self.rule_name = rule_name
         self.channel_name = channel_name
         self.definition = definition
@@ -11,8 +11,11 @@ class Trigger:
         self.parameters = parameters
 
         boolean_definition = self.definition['definition']['boolean']
-        boolean_string = boolean_definition.format(*parameters)
-        self.boolean = MyBoolean.Boolean(boolean_string)
+        if compiler is not None:
+            self.boolean = compiler.getBoolean(boolean_definition, parameters)
+        else:
+            boolean_string = boolean_definition.format(*parameters)
+            self.boolean = MyBoolean.Boolean(boolean_string)
 
     def getConditions(self):
         yield from self.boolean.getConditions()
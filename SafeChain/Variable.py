@@ -3,6 +3,8 @@
 # TODO getPossibleValues should comply with self.grouping
 
 import abc
+import bisect
+import collections.abc
 import re
 
 class Variable(metaclass=abc.ABCMeta):
@@ -217,6 +219,23 @@ class SetVariable(Variable):
     def setPruned(self, status):
         self.pruned = status
 
+class IntegerRange(collections.abc.Set):
+    def __init__(self, minValue, maxValue):
+        self.range = range(minValue, maxValue + 1)
+
+    def __contains__(self, value):
+        return isinstance(value, int) and value in self.range
+
+    def __iter__(self):
+        return iter(self.range)
+
+    def __len__(self):
+        return len(self.range)
+
+    @classmethod
+    def _from_iterable(cls, iterable):
+        return set(iterable)
+
 class RangeVariable(Variable):
     def __init__(self, channel_name, definition, name):
         self.channel_name = channel_name
@@ -232,34 +251,69 @@ class RangeVariable(Variable):
         self.pruned = False
 
     def getPossibleValues(self):
-        return set(range(self.definition['minValue'], self.definition['maxValue'] + 1))
+        return IntegerRange(self.definition['minValue'], self.definition['maxValue'])
 
-    def getPossibleGroups(self):
+    def getWindow(self):
         if 'window' in self.definition:
             minValue = max(self.definition['minValue'], self.value - self.definition['window'])
             maxValue = min(self.definition['maxValue'], self.value + self.definition['window'])
-            return set(self.mapping[i] for i in range(minValue, maxValue+1))
+        else:
+            minValue = self.definition['minValue']
+            maxValue = self.definition['maxValue']
 
-        return set(self.mapping.values())
+        return minValue, maxValue
+
+    def getGroup(self, value):
+        if self.starts is None:
+            return value
+
+        index = bisect.bisect_right(self.starts, value) - 1
+        if index < 0 or value > self.ends[index]:
+            raise KeyError(value)
+
+        label = self.labels[index]
+        return str(value) if label is None else label
+
+    def getGroupsBetween(self, minValue, maxValue):
+        if minValue > maxValue:
+            return set()
+
+        if self.starts is None:
+            return IntegerRange(minValue, maxValue)
+
+        groups = set()
+        index = max(bisect.bisect_right(self.starts, minValue) - 1, 0)
+        while index < len(self.starts) and self.starts[index] <= maxValue:
+            start = max(self.starts[index], minValue)
+            end = min(self.ends[index], maxValue)
+            label = self.labels[index]
+            if start > end:
+                pass
+            elif label is None:
+                groups.update(str(value) for value in range(start, end + 1))
+            else:
+                groups.add(label)
+            index += 1
+
+        return groups
+
+    def getPossibleGroups(self):
+        minValue, maxValue = self.getWindow()
+        return self.getGroupsBetween(minValue, maxValue)
 
     def getPossibleGroupsInNuSMV(self):
         if self.grouped:
             groups = sorted(self.getPossibleGroups())
             string = ', '.join(groups)
             return '{{{0}}}'.format(string)
-        elif 'window' in self.definition:
-            minValue = max(self.definition['minValue'], self.value - self.definition['window'])
-            maxValue = min(self.definition['maxValue'], self.value + self.definition['window'])
-            return '{0}..{1}'.format(minValue, maxValue)
         else:
-            return '{0}..{1}'.format(self.definition['minValue'], self.definition['maxValue'])
+            return '{0}..{1}'.format(*self.getWindow())
 
     def setValue(self, value):
         self.value = value
 
         if 'window' in self.definition:
-            minValue = max(self.definition['minValue'], self.value - self.definition['window'])
-            maxValue = min(self.definition['maxValue'], self.value + self.definition['window'])
+            minValue, maxValue = self.getWindow()
             self.addConstraint('>=', minValue)
             self.addConstraint('<=', maxValue)
 
@@ -284,22 +338,66 @@ class RangeVariable(Variable):
         else:
             self.constraints.add((operator, value))
 
+    def getSegments(self, group):
+        # the (start, end) intervals of the window that a group stands for
+        minValue, maxValue = self.getWindow()
+        if self.starts is None:
+            return [(int(group), int(group))]
+
+        segments = list()
+        for start, end, label in zip(self.starts, self.ends, self.labels):
+            start = max(start, minValue)
+            end = min(end, maxValue)
+            if start > end:
+                continue
+
+            if label is None:
+                if re.fullmatch(r'-?\d+', group) and start <= int(group) <= end:
+                    segments.append((int(group), int(group)))
+            elif label == group:
+                segments.append((start, end))
+
+        return segments
+
+    def setSegments(self, segments):
+        # segments are sorted, disjoint (start, end, label) intervals; a None
+        # label stands for the value itself
+        minValue = self.definition['minValue']
+        maxValue = self.definition['maxValue']
+
+        self.starts = list()
+        self.ends = list()
+        self.labels = list()
+        for start, end, label in segments:
+            start = max(start, minValue)
+            end = min(end, maxValue)
+            if start > end:
+                continue
+
+            self.starts.append(start)
+            self.ends.append(end)
+            self.labels.append(label)
+
     def setGrouping(self, status):
         self.grouped = False
+        self.starts = None
+        self.ends = None
+        self.labels = None
+
         if status != True:
-            self.mapping = dict((value, value) for value in self.getPossibleValues())
             self.constraints.clear()
             return
 
         values = set(value for operator, value in self.constraints)
         if None in values:
-            self.mapping = dict((value, value) for value in self.getPossibleValues())
             return
 
         self.grouped = True
+        minValue = self.definition['minValue']
+        maxValue = self.definition['maxValue']
 
         if len(values) == 0:
-            self.mapping = dict((value, 'ALL') for value in self.getPossibleValues())
+            self.setSegments([(minValue, maxValue, 'ALL')])
             return
 
         continuous = False
@@ -307,40 +405,37 @@ class RangeVariable(Variable):
             if '>' in operator or '<' in operator:
                 continuous = True
 
-        values = set(int(value) for value in values)
+        values = sorted(set(int(value) for value in values))
+        segments = list()
         if not continuous:
-            if len(values) >= len(self.getPossibleValues()) - 1:
-                self.mapping = dict((value, str(value)) for value in self.getPossibleValues())
+            if len(values) >= maxValue - minValue:
+                segments.append((minValue, maxValue, None))
             else:
-                self.mapping = dict((value, str(value)) if value in values else (value, 'OTHERS') for value in self.getPossibleValues())
+                previous = minValue
+                for value in values:
+                    segments.append((previous, value - 1, 'OTHERS'))
+                    segments.append((value, value, None))
+                    previous = max(previous, value + 1)
+                segments.append((previous, maxValue, 'OTHERS'))
         else:
-            self.mapping = dict()
-            values = sorted(values)
-            if self.definition['minValue'] not in values:
-                for value in range(self.definition['minValue'], values[0]):
-                    self.mapping[value] = 'between_min_{}'.format(values[0])
+            if minValue not in values:
+                segments.append((minValue, values[0] - 1, 'between_min_{}'.format(values[0])))
 
             for i in range(len(values) - 1):
-                self.mapping[values[i]] = '{}'.format(values[i])
-                for value in range(values[i] + 1, values[i+1]):
-                    self.mapping[value] = 'between_{0}_{1}'.format(values[i], values[i+1])
-            self.mapping[values[-1]] = '{}'.format(values[-1])
+                segments.append((values[i], values[i], None))
+                segments.append((values[i] + 1, values[i+1] - 1, 'between_{0}_{1}'.format(values[i], values[i+1])))
+            segments.append((values[-1], values[-1], None))
 
-            if self.definition['maxValue'] not in values:
-                for value in range(values[-1] + 1, self.definition['maxValue'] + 1):
-                    self.mapping[value] = 'between_{}_max'.format(values[-1])
+            if maxValue not in values:
+                segments.append((values[-1] + 1, maxValue, 'between_{}_max'.format(values[-1])))
 
+        self.setSegments(segments)
 
     def getEquivalentTriggerCondition(self, operator, value):
         if not self.grouped:
             return (operator, value)
 
-        if 'window' in self.definition:
-            minValue = max(self.definition['minValue'], self.value - self.definition['window'])
-            maxValue = min(self.definition['maxValue'], self.value + self.definition['window'])
-        else:
-            minValue = self.definition['minValue']
-            maxValue = self.definition['maxValue']
+        minValue, maxValue = self.getWindow()
 
         if operator == '=':
             if 'window' in self.definition:
@@ -352,30 +447,25 @@ class RangeVariable(Variable):
                 return (operator, value)
 
         if operator == '>':
-            minValue = max(int(value) + 1, minValue)
-            possible_values = range(minValue, maxValue+1)
+            values = self.getGroupsBetween(max(int(value) + 1, minValue), maxValue)
         elif operator == '>=':
-            minValue = max(int(value), minValue)
-            possible_values = range(minValue, maxValue+1)
+            values = self.getGroupsBetween(max(int(value), minValue), maxValue)
         elif operator == '<':
-            maxValue = min(int(value) - 1, maxValue)
-            possible_values = range(minValue, maxValue+1)
+            values = self.getGroupsBetween(minValue, min(int(value) - 1, maxValue))
         elif operator == '<=':
-            maxValue = min(int(value), maxValue)
-            possible_values = range(minValue, maxValue+1)
+            values = self.getGroupsBetween(minValue, min(int(value), maxValue))
         elif operator == '!=':
             int_value = int(value)
-            possible_values = set(value for value in range(minValue, maxValue+1) if value != int_value)
+            values = self.getGroupsBetween(minValue, min(int_value - 1, maxValue))
+            values |= self.getGroupsBetween(max(int_value + 1, minValue), maxValue)
         else:
             return (operator, value)
 
-        values = set(self.mapping[value] for value in possible_values)
         if len(values) == 1:
             value = values.pop()
             return ('=', value)
         else:
-            return ('in', '{{{0}}}'.format(', '.join(str(value) for value in values)))
-
+            return ('in', '{{{0}}}'.format(', '.join(sorted(str(value) for value in values))))
 
     def getEquivalentActionCondition(self, value):
         if not self.grouped:
@@ -384,12 +474,12 @@ class RangeVariable(Variable):
         if isinstance(value, str) and '{' in value:
             value = value.replace('{', '').replace('}', '').replace(' ', '')
             values = value.split(',')
-            values = set(self.mapping[value] for value in values)
+            values = set(self.getGroup(int(value)) for value in values)
         elif isinstance(value, str) and '..' in value:
             minValue, maxValue = value.split('..')
-            values = set(self.mapping[value] for value in range(int(minValue), int(maxValue)+1))
+            values = self.getGroupsBetween(int(minValue), int(maxValue))
         else:
-            values = set([self.mapping[int(value)]])
+            values = set([self.getGroup(int(value))])
 
         if len(values) == 1:
             value = values.pop()
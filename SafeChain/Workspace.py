@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+
+import atexit
+import os
+import shutil
+import tempfile
+import threading
+
+class Workspace:
+    """
+    Directory the models are handed to NuSMV through, on a RAM-backed file
+    system (/dev/shm) when there is one. Every file is removed as soon as its
+    check is over and the directory when the workspace is closed or the
+    interpreter exits, unless keep is set for debugging.
+    """
+    def __init__(self, root=None, keep=False):
+        if root is None and os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+            root = '/dev/shm'
+
+        self.root = root
+        self.keep = keep
+        self.directory = None
+        self.lock = threading.Lock()
+        atexit.register(self.close)
+
+    def getDirectory(self):
+        with self.lock:
+            if self.directory is None or not os.path.isdir(self.directory):
+                self.directory = tempfile.mkdtemp(prefix='safechain-', dir=self.root)
+            return self.directory
+
+    def write(self, model, prefix='model-', suffix='.smv'):
+        fd, filename = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=self.getDirectory())
+        with os.fdopen(fd, 'w') as f:
+            f.write(model)
+        return filename
+
+    def makeDirectory(self, prefix='job-'):
+        return tempfile.mkdtemp(prefix=prefix, dir=self.getDirectory())
+
+    def release(self, path):
+        if self.keep or path is None:
+            return
+
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        with self.lock:
+            if self.directory is not None and not self.keep:
+                shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+default_workspace = None
+
+def getDefaultWorkspace():
+    global default_workspace
+    if default_workspace is None:
+        default_workspace = Workspace()
+    return default_workspace
@@ -0,0 +1,129 @@
+import argparse
+import itertools
+import json
+import random
+import sys
+import time
+
+from SafeChain.Controller import Controller
+from SafeChain.PrivacyPolicy import PrivacyPolicy
+from SafeChain.InvariantPolicy import InvariantPolicy
+from SafeChain.BatchVerifier import buildController
+from SafeChain.ChannelDatabase import loadDatabase
+from SafeChain.RecipeImporter import RecipeImporter
+
+
+def sample_home(database, recipes, size, rng):
+    """
+    Sample a home of `size` rules from the recipe distribution and return it
+    as a BatchVerifier scenario without a policy.
+    """
+    importer = RecipeImporter(database, rng)
+    sampled = [rng.choice(recipes) for _ in range(size)]
+    sampled = [(index,) + recipe[1:] for index, recipe in enumerate(sampled)]
+
+    controller = Controller(database)
+    for channel_type in sorted(set(recipe[1] for recipe in sampled) | set(recipe[3] for recipe in sampled)):
+        importer.ensureChannel(controller, channel_type)
+    channels = [(channel.channel_name, channel_name, dict((variable_name, variable.value) for variable_name, variable in channel.variables.items()))
+                for channel_name, channel in controller.channels.items()]
+
+    rules = importer.importInto(controller, sampled, create_channels=False)
+    return {'channels': channels, 'rules': rules, 'controller': controller}
+
+def sample_policies(home, rng):
+    controller = home['controller']
+    trigger_variables = sorted(set(variable
+                                   for rule in controller.rules
+                                   for condition in rule.getTriggerConditions()
+                                   for variable in condition.getVariables()))
+    action_variables = sorted(set(variable
+                                  for rule in controller.rules
+                                  for condition in rule.getActionConditions()
+                                  for variable in condition.getVariables()))
+    if len(trigger_variables) == 0 or len(action_variables) == 0:
+        return dict()
+
+    high = rng.choice(trigger_variables)
+    vulnerable_channel = rng.choice(action_variables)[0]
+
+    channel_name, variable_name = rng.choice(action_variables)
+    variable = controller.getChannel(channel_name).getVariable(variable_name)
+    value = rng.choice(sorted(variable.getPossibleValues(), key=str))
+
+    return {
+        'privacy': {'vulnerables': [(vulnerable_channel, None)], 'high': [high]},
+        'invariant': {'vulnerables': [(vulnerable_channel, None)], 'boolean': '{0}.{1} != {2}'.format(channel_name, variable_name, value)},
+    }
+
+def make_policy(policy_type, specification):
+    if policy_type == 'privacy':
+        return PrivacyPolicy(set(tuple(variable) for variable in specification['high']))
+    return InvariantPolicy(specification['boolean'])
+
+def run(args, out):
+    database = loadDatabase(args.database, args.channels)
+    importer = RecipeImporter(database)
+    recipes = list(importer.resolve(importer.readRecipes(args.recipes)))
+    rng = random.Random(args.seed)
+
+    for size, home_index in itertools.product(args.sizes, range(args.homes)):
+        home = sample_home(database, recipes, size, rng)
+        policies = sample_policies(home, rng)
+
+        for policy_type in args.policies:
+            if policy_type not in policies:
+                continue
+
+            specification = policies[policy_type]
+            for grouping, pruning, bmc in itertools.product((False, True), repeat=3):
+                scenario = {'channels': home['channels'], 'rules': home['rules'], 'vulnerables': specification['vulnerables']}
+                controller = buildController(database, scenario)
+                policy = make_policy(policy_type, specification)
+
+                record = {
+                    'seed': args.seed, 'size': size, 'home': home_index, 'rules': len(home['rules']),
+                    'policy': policy_type, 'grouping': grouping, 'pruning': pruning, 'bmc': bmc,
+                }
+
+                start = time.perf_counter()
+                try:
+                    output = controller.check(policy, grouping=grouping, pruning=pruning, timeout=args.timeout, bmc=bmc, trace=False)
+                except Exception as exception:
+                    record['verdict'] = 'ERROR'
+                    record['error'] = repr(exception)
+                else:
+                    record['verdict'] = 'TIMEOUT' if output.result is None else output.result['result']
+                    # small homes are checked by the explicit-state engine instead of NuSMV
+                    record['engine'] = 'nusmv' if output.result is None else output.result.get('engine', 'nusmv')
+                    record['grouping_time'] = output.grouping_time
+                    record['pruning_time'] = output.pruning_time
+                    record['overhead'] = output.overhead
+                    record['checking_time'] = output.checking_time
+                    record['stats'] = output.stats.asDict()
+                record['wall_time'] = time.perf_counter() - start
+
+                out.write(json.dumps(record, sort_keys=True) + '\n')
+                out.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description='Scaling benchmark over homes sampled from rules.tsv')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000])
+    parser.add_argument('--homes', type=int, default=3, help='homes sampled per size')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=int, default=600)
+    parser.add_argument('--policies', nargs='+', choices=['privacy', 'invariant'], default=['privacy', 'invariant'])
+    parser.add_argument('--recipes', default='rules.tsv')
+    parser.add_argument('--channels', default='channels')
+    parser.add_argument('--database', default='channels.db')
+    parser.add_argument('--output', help='JSON lines file, stdout by default')
+    args = parser.parse_args()
+
+    if args.output:
+        with open(args.output, 'w') as out:
+            run(args, out)
+    else:
+        run(args, sys.stdout)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+
+import json
+import os
+import unittest
+
+import SafeChain.Channel as MyChannel
+import SafeChain.Controller as MyController
+import SafeChain.IncrementalVerifier as MyIncrementalVerifier
+import SafeChain.InvariantPolicy as MyInvariantPolicy
+
+CHANNEL_DIRECTORY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'channels')
+
+class IncrementalVerifierTest(unittest.TestCase):
+    def setUp(self):
+        with open(os.path.join(CHANNEL_DIRECTORY, 'Philips Hue.json')) as f:
+            database = {'Philips Hue': json.load(f)}
+
+        self.controller = MyController.Controller(database)
+        self.channel = MyChannel.Channel('Philips Hue', database['Philips Hue'], 'hue')
+        self.values = self.channel.getPossibleValuesOfVariables()
+        self.channel.setState(dict((variable_name, sorted(values)[0]) for variable_name, values in self.values.items()))
+        self.controller.addChannel(self.channel)
+
+        # NuSMV is not needed, every run is counted and holds; the explicit engine would skip it
+        self.controller.setExplicitThreshold(None)
+        self.runs = 0
+        def runNuSMV(model, filename, timeout, bmc=False, parser=None, order=None, bmc_length=None):
+            self.runs += 1
+            return {'result': 'SUCCESS'}
+        self.controller.runNuSMV = runNuSMV
+
+        self.verifier = MyIncrementalVerifier.IncrementalVerifier(self.controller)
+        self.verifier.addPolicy('p', MyInvariantPolicy.InvariantPolicy('hue.status = FALSE'))
+        self.verifier.verify()
+
+    def testUnchangedHomeIsReused(self):
+        self.verifier.verify()
+        self.assertEqual(self.verifier.rechecked, [])
+        self.assertEqual(self.verifier.reused, ['p'])
+        self.assertEqual(self.runs, 1)
+
+    def testVulnerableVariableIsRechecked(self):
+        self.controller.addVulnerableChannelVariable('hue', 'status')
+        self.verifier.verify()
+        self.assertEqual(self.verifier.rechecked, ['p'])
+        self.assertEqual(self.runs, 2)
+
+    def testInitialValueIsRechecked(self):
+        self.channel.setState({'status': sorted(self.values['status'])[-1]})
+        self.verifier.verify()
+        self.assertEqual(self.verifier.rechecked, ['p'])
+        self.assertEqual(self.runs, 2)
+
+if __name__ == '__main__':
+    unittest.main()